@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Records stored by the other scripts are appended to data/data.jsonl. This
+script folds them into the single-file data/data.json snapshot.
+
+With --check, data.json is not written: the output of write_json() is compared
+byte for byte with the encoder it replaced, on the current data and on a set
+of edge cases.
+"""
+
+import argparse
+import io
+import json
+import re
+import sys
+
+from functions import compact_json_data, get_json_data, write_json
+
+
+# Values that are easy to get wrong when writing lists of lists on one line.
+EDGE_CASES = [
+    {},
+    [],
+    {"a": []},
+    {"a": {}},
+    [[]],
+    [[], []],
+    [[1, 2], [3, 4]],
+    [[1, [2, 3]], [4, 5]],
+    [(1, 2), (3, 4)],
+    [[1, 2], 3],
+    [["a[b]", 1], ["c", 2]],
+    [["a]", 1]],
+    [[{"a": 1}, 2]],
+    [[{"a": [1, 2]}, 2]],
+    [["é", "日本"], ["\n", "\t"]],
+    [[1.5, float("inf")], [float("-inf"), float("nan")]],
+    [[None, True], [False, 0]],
+    {"b": [[1, 2]], "a": {"c": [[3, 4], [5, 6]], "d": [1, 2]}},
+    {"x": [[[1, 2], [3, 4]], [[5, 6]]]},
+    [["a", "b"], ["c, d", "e"]],
+]
+
+
+def legacy_encode(value):
+    """Encode value as the old InlineListEncoder did."""
+    json_str = json.dumps(value, indent=2, sort_keys=True)
+    # Collapse arrays containing one or more nested arrays on a single line.
+    pattern = re.compile(r"\[\s*((?:\[[^\[\]]+\](?:,\s*)?)+)\s*\]")
+
+    def collapse(match):
+        inner = re.sub(r"\s*\n\s*", " ", match.group(1))
+        return "[" + inner + "]"
+
+    return pattern.sub(collapse, json_str)
+
+
+def check_encoder():
+    """Return True if write_json() matches the old encoder."""
+    values = [("data.json", get_json_data())] + [
+        (f"edge case {i}", value) for i, value in enumerate(EDGE_CASES)
+    ]
+    ok = True
+    for name, value in values:
+        f = io.StringIO()
+        write_json(value, f)
+        if f.getvalue() != legacy_encode(value):
+            print(f"Output differs from the old encoder: {name}")
+            ok = False
+    if ok:
+        print(f"Output matches the old encoder ({len(values)} values)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--check",
+        help="Compare the JSON output with the old encoder, without writing data",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check_encoder() else 1)
+    compact_json_data()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,41 +3,163 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import argparse
+import atexit
 import configparser
+import fcntl
+import hashlib
 import json
 import os
 import random
 import re
 import sys
+import tempfile
+import threading
 import time
 import urllib.parse
 
-from datetime import date, datetime, time as dt_time, timedelta
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from datetime import UTC, date, datetime, time as dt_time, timedelta
+from functools import cache
 
-import gspread
-import requests
-import urllib3
+import github_cache
 
-from github import Github
-from jira import JIRA
-from phab_cache import get_group, get_transactions, set_group, set_transactions
+from phab_cache import (
+    get_group,
+    get_stale_transactions,
+    get_transactions,
+    set_group,
+    set_transactions,
+)
 
 
-class InlineListEncoder(json.JSONEncoder):
-    def encode(self, o):
-        # First, encode using the parent class to respect indent and sort_keys.
-        json_str = super().encode(o)
-        # Define a regex pattern that matches arrays containing one or more nested arrays.
-        pattern = re.compile(r"\[\s*((?:\[[^\[\]]+\](?:,\s*)?)+)\s*\]")
+CONFIG_FILE = os.path.join(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)),
+    "api_config.env",
+)
+# Prefix of environment variables overriding values from CONFIG_FILE.
+CONFIG_ENV_PREFIX = "L10N_STATS_"
 
-        def collapse(match):
-            inner = match.group(1)
-            # Replace newlines and extra whitespace inside the array with a single space.
-            inner = re.sub(r"\s*\n\s*", " ", inner)
-            return "[" + inner + "]"
+# Safety margin (in seconds) when comparing a revision's modification date
+# with the local time transactions were fetched at.
+PHAB_CLOCK_SKEW = 5 * 60
 
-        # Apply the regex substitution to collapse nested arrays.
-        return pattern.sub(collapse, json_str)
+# Maximum age (in seconds) of the end of a date range to search revisions in a
+# single pass. Older ranges would fetch too many revisions modified since then.
+PHAB_SINGLE_PASS_MAX_AGE = 14 * 24 * 60 * 60
+
+# Default number of concurrent Conduit requests when prefetching transactions.
+PHAB_WORKERS = 4
+
+# Size of the keep-alive connection pool used for Conduit requests.
+PHAB_POOL_SIZE = 16
+
+# Upper bounds (in seconds) of the API latency histogram buckets.
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10)
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Size of the keep-alive connection pool used for GitHub requests (covers
+# search ranges split within concurrent repositories).
+GITHUB_POOL_SIZE = 16
+
+# Default number of repositories queried concurrently in get_pr_details().
+GITHUB_WORKERS = 4
+
+# Maximum number of users included in the same contributions query.
+GITHUB_USERS_PER_QUERY = 10
+
+# GraphQL error types that won't go away when retrying the request, accepted
+# for single aliased fields in partial responses.
+GITHUB_PERMANENT_ERRORS = ("NOT_FOUND",)
+
+# Maximum number of PRs included in the same query for additional reviews.
+GITHUB_PRS_PER_QUERY = 10
+
+# Maximum number of results returned by GitHub for a search query.
+GITHUB_SEARCH_LIMIT = 1000
+
+# Safety margin (in seconds) when searching for PRs updated since the last
+# fetch, as the search index can lag behind.
+GITHUB_CACHE_SKEW = 60 * 60
+
+# Pause GitHub requests until the rate limit resets when fewer points than
+# this are left.
+GITHUB_RATE_LIMIT_RESERVE = 50
+
+# Add to GraphQL queries (top level) to track the rate limit.
+GITHUB_RATE_LIMIT_FIELD = "rateLimit { cost remaining resetAt }"
+
+_conduit_client = None
+_conduit_client_lock = threading.Lock()
+
+_github_client = None
+_github_client_lock = threading.Lock()
+
+_data_store = None
+_data_store_lock = threading.Lock()
+
+
+def _inline_json(value, nested=False):
+    """Return a list of pairs item on a single line, e.g. [ "D123", 1.5 ].
+
+    Returns None if the value can't be inlined: it contains other lists, or
+    square brackets within strings.
+    """
+    if isinstance(value, dict):
+        if not value:
+            return "{}"
+        parts = []
+        for key in sorted(value):
+            key_json = json.dumps(key)
+            item_json = _inline_json(value[key], nested=True)
+            if item_json is None or "[" in key_json or "]" in key_json:
+                return None
+            parts.append(f"{key_json}: {item_json}")
+        return "{ " + ", ".join(parts) + " }"
+    if isinstance(value, (list, tuple)):
+        if nested or not value:
+            return None
+        parts = [_inline_json(item, nested=True) for item in value]
+        if None in parts:
+            return None
+        return "[ " + ", ".join(parts) + " ]"
+    value_json = json.dumps(value)
+    return None if "[" in value_json or "]" in value_json else value_json
+
+
+def write_json(value, f, level=0, indent="  "):
+    """Stream value to f as JSON, with sorted keys and indentation.
+
+    Lists of lists (e.g. [diff_id, time] pairs) are written on a single line.
+    """
+    if isinstance(value, dict):
+        if not value:
+            f.write("{}")
+            return
+        separator = "\n" + indent * (level + 1)
+        for i, key in enumerate(sorted(value)):
+            f.write(("{" if i == 0 else ",") + separator + json.dumps(key) + ": ")
+            write_json(value[key], f, level + 1, indent)
+        f.write("\n" + indent * level + "}")
+    elif isinstance(value, (list, tuple)):
+        if not value:
+            f.write("[]")
+            return
+        if all(isinstance(item, (list, tuple)) for item in value):
+            items = [_inline_json(item) for item in value]
+            if None not in items:
+                f.write("[" + ", ".join(items) + "]")
+                return
+        separator = "\n" + indent * (level + 1)
+        for i, item in enumerate(value):
+            f.write(("[" if i == 0 else ",") + separator)
+            write_json(item, f, level + 1, indent)
+        f.write("\n" + indent * level + "]")
+    else:
+        f.write(json.dumps(value))
 
 
 def ymd(value):
@@ -52,6 +174,7 @@ def parse_arguments(
     user=False,
     group=False,
     dry=False,
+    phab=False,
 ):
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -74,6 +197,19 @@ def parse_arguments(
         parser.add_argument("--user", "-u", help="Username on GitHub")
     if dry:
         parser.add_argument("--dry", help="Do not store JSON data", action="store_true")
+    if phab:
+        parser.add_argument(
+            "--workers",
+            "-w",
+            type=int,
+            default=PHAB_WORKERS,
+            help=f"Concurrent Conduit requests (defaults to {PHAB_WORKERS})",
+        )
+        parser.add_argument(
+            "--check-search",
+            help="Compare single-pass revision searches with separate created/modified searches",
+            action="store_true",
+        )
     args = parser.parse_args()
 
     if not args.start:
@@ -91,33 +227,80 @@ def parse_arguments(
     return args
 
 
-def read_config(key):
-    # Read config file in the parent folder
-    config_file = os.path.join(
-        os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)),
-        "api_config.env",
-    )
+@dataclass(frozen=True)
+class Config:
+    """API credentials and endpoints, see load_config()."""
+
+    # Secrets are excluded from repr(), to avoid leaking them in logs.
+    github_token: str | None = field(default=None, repr=False)
+    jira_email: str | None = None
+    jira_token: str | None = field(default=None, repr=False)
+    jira_server: str | None = None
+    phabricator_token: str | None = field(default=None, repr=False)
+    phabricator_server: str | None = None
+    phabricator_user_agent: str = "phab-urllib3"
+    # Google Sheets keys and service account credentials, with lowercase keys.
+    gdocs: dict = field(default_factory=dict, repr=False)
+
+    def require(self, *names):
+        """Return the values of the given fields, failing if any is missing."""
+        values = tuple(getattr(self, name) for name in names)
+        missing = [name.upper() for name, value in zip(names, values) if not value]
+        if missing:
+            raise RuntimeError(
+                f"Missing configuration: {', '.join(missing)}. Set it in "
+                f"{CONFIG_FILE}, or with the {CONFIG_ENV_PREFIX}<NAME> "
+                "environment variable."
+            )
+        return values
+
+
+@cache
+def load_config():
+    """Read api_config.env in the parent folder once per process.
+
+    Each value can be overridden with an environment variable prefixed with
+    CONFIG_ENV_PREFIX, e.g. L10N_STATS_GITHUB_TOKEN, or
+    L10N_STATS_GDOCS_SPREADSHEET_KEY for values in the GDOCS section.
+    """
     config = configparser.ConfigParser(interpolation=None)
-    config.read(config_file)
-    if key == "github":
-        return config.get("KEYS", "GITHUB_TOKEN")
-
-    if key == "jira":
-        return (
-            config.get("KEYS", "JIRA_EMAIL"),
-            config.get("KEYS", "JIRA_TOKEN"),
-            config.get("URLS", "JIRA_SERVER"),
-        )
+    config.read(CONFIG_FILE)
 
-    if key == "phab":
-        return (
-            config.get("KEYS", "PHABRICATOR_TOKEN"),
-            config.get("URLS", "PHABRICATOR_SERVER"),
-            config.get("KEYS", "PHABRICATOR_USER_AGENT", fallback="phab-urllib3"),
+    values = {}
+    for config_field in fields(Config):
+        if config_field.name == "gdocs":
+            continue
+        option = config_field.name.upper()
+        section = "URLS" if option.endswith("_SERVER") else "KEYS"
+        # Empty variables (e.g. a missing Actions secret) are ignored.
+        value = os.environ.get(f"{CONFIG_ENV_PREFIX}{option}") or config.get(
+            section, option, fallback=None
         )
+        if value:
+            values[config_field.name] = value
+
+    gdocs = dict(config.items("GDOCS")) if config.has_section("GDOCS") else {}
+    gdocs_prefix = f"{CONFIG_ENV_PREFIX}GDOCS_"
+    for name, value in os.environ.items():
+        if name.startswith(gdocs_prefix) and value:
+            gdocs[name.removeprefix(gdocs_prefix).lower()] = value
+
+    return Config(gdocs=gdocs, **values)
+
+
+def _latency_bucket(elapsed):
+    return next(
+        (i for i, limit in enumerate(LATENCY_BUCKETS) if elapsed < limit),
+        len(LATENCY_BUCKETS),
+    )
 
-    if key == "gdocs":
-        return dict(config.items("GDOCS"))
+
+def _format_latency(latency):
+    labels = [f"<{limit}s" for limit in LATENCY_BUCKETS]
+    labels.append(f">={LATENCY_BUCKETS[-1]}s")
+    return "Latency: " + ", ".join(
+        f"{label}: {count}" for label, count in zip(labels, latency)
+    )
 
 
 def format_time(interval):
@@ -141,8 +324,14 @@ def check_date_interval(start_date, end_date, timestamp):
     return start_dt <= dt <= end_dt
 
 
-def get_github_object():
-    github_token = read_config(key="github")
+def get_github_object(config=None):
+    # API clients are imported on first use, to keep startup fast for scripts
+    # that don't need them.
+    import urllib3
+
+    from github import Github
+
+    (github_token,) = (config or load_config()).require("github_token")
     return Github(
         github_token,
         retry=urllib3.util.retry.Retry(
@@ -151,40 +340,325 @@ def get_github_object():
     )
 
 
-def github_api_request(query, _retries=3, _backoff=0.8):
-    url = "https://api.github.com/graphql"
-    github_token = read_config(key="github")
-    json_query = {"query": query}
-    headers = {"Authorization": f"token {github_token}"}
+class GraphQLClient:
+    """GitHub GraphQL client sharing a keep-alive session across calls.
+
+    The rate limit is tracked from response headers, and from the rateLimit
+    field when the query includes GITHUB_RATE_LIMIT_FIELD. Requests from all
+    threads are paused until the reset time when the remaining points drop
+    below GITHUB_RATE_LIMIT_RESERVE, or after a secondary rate limit response.
+    Usage statistics are collected in self.stats.
+    """
+
+    def __init__(self, token, url=GITHUB_GRAPHQL_URL, pool_size=GITHUB_POOL_SIZE):
+        import requests
+
+        self.url = url
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"token {token}"
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size
+        )
+        self.session.mount("https://", adapter)
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "cost": 0,
+            "bytes_received": 0,
+            "latency": [0] * (len(LATENCY_BUCKETS) + 1),
+            "remaining": None,
+            "reset_at": None,
+        }
+        self._lock = threading.Lock()
+        self._backoff_until = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(*config.require("github_token"))
+
+    def _wait_rate_limit(self):
+        with self._lock:
+            until = self._backoff_until
+            remaining = self.stats["remaining"]
+            if remaining is not None and remaining < GITHUB_RATE_LIMIT_RESERVE:
+                until = max(until, (self.stats["reset_at"] or 0) + 1)
+        delay = until - time.time()
+        if delay > 0:
+            print(f"Waiting {round(delay)}s for the GitHub rate limit...")
+            time.sleep(delay)
+
+    def _set_backoff(self, sleep_s):
+        with self._lock:
+            self._backoff_until = max(self._backoff_until, time.time() + sleep_s)
+
+    def _update_rate_limit(self, headers, data):
+        rate_limit = ((data or {}).get("data") or {}).get("rateLimit")
+        with self._lock:
+            if rate_limit:
+                self.stats["cost"] += rate_limit["cost"]
+                self.stats["remaining"] = rate_limit["remaining"]
+                self.stats["reset_at"] = datetime.fromisoformat(
+                    rate_limit["resetAt"]
+                ).timestamp()
+            elif headers.get("X-RateLimit-Remaining", "").isdigit():
+                self.stats["remaining"] = int(headers["X-RateLimit-Remaining"])
+                if headers.get("X-RateLimit-Reset", "").isdigit():
+                    self.stats["reset_at"] = int(headers["X-RateLimit-Reset"])
+
+    def post(self, query, retries=3, backoff=0.8, partial=False):
+        """Run a GraphQL query, returning the response and its decoded JSON.
+
+        If partial is True, responses with errors are accepted as long as they
+        include some data, and all errors are permanent ones for aliased fields
+        (e.g. a user that doesn't exist). Other errors are retried.
+        """
+        attempt = 0
+        while True:
+            self._wait_rate_limit()
+            start = time.monotonic()
+            r = self.session.post(url=self.url, json={"query": query})
+            bucket = _latency_bucket(time.monotonic() - start)
+            try:
+                data = r.json()
+            except ValueError:
+                data = None
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["bytes_received"] += len(r.content)
+                self.stats["latency"][bucket] += 1
+            self._update_rate_limit(r.headers, data)
+
+            if (
+                data is not None
+                and r.status_code == 200
+                and (
+                    "errors" not in data
+                    or (
+                        partial
+                        and data.get("data")
+                        and all(
+                            error.get("path")
+                            and error.get("type") in GITHUB_PERMANENT_ERRORS
+                            for error in data["errors"]
+                        )
+                    )
+                )
+            ):
+                return r, data
+
+            if attempt >= retries:
+                reason = (
+                    f"HTTP {r.status_code}, body: {r.text[:500]!r}"
+                    if data is None
+                    else f"GraphQL errors: {data.get('errors')}"
+                )
+                raise RuntimeError(
+                    f"GitHub GraphQL request failed after {retries} retries: {reason}"
+                )
+
+            retry_after = r.headers.get("Retry-After", "")
+            if r.status_code in (403, 429) and retry_after.isdigit():
+                # Secondary rate limit, pause requests from all threads.
+                self._set_backoff(int(retry_after))
+            else:
+                time.sleep(backoff * (2**attempt) + random.uniform(0, 0.5))
+            with self._lock:
+                self.stats["retries"] += 1
+            attempt += 1
+
+    def query(self, query, retries=3, backoff=0.8):
+        """Run a GraphQL query, returning its data."""
+        return self.post(query, retries, backoff)[1]["data"]
+
+    def print_stats(self):
+        stats = self.stats
+        print(
+            f"\nGitHub: {stats['requests']} requests, {stats['retries']} retries, "
+            f"{stats['cost']} rate limit points, "
+            f"{stats['bytes_received'] / 1024:.1f} KB received"
+        )
+        if stats["remaining"] is not None:
+            reset_at = datetime.fromtimestamp(stats["reset_at"] or 0)
+            print(
+                f"Rate limit: {stats['remaining']} points left, "
+                f"reset at {reset_at.strftime('%H:%M')}"
+            )
+        print(_format_latency(stats["latency"]))
+
+
+def get_github_client():
+    """Return the GitHub GraphQL client shared by the whole process."""
+    global _github_client
+    with _github_client_lock:
+        if _github_client is None:
+            _github_client = GraphQLClient.from_config(load_config())
+        return _github_client
+
+
+def print_github_stats():
+    """Print GitHub usage statistics, if any request was made."""
+    if _github_client is not None:
+        _github_client.print_stats()
 
-    attempt = 0
+
+def github_search_page(query, cursor="", client=None):
+    """Return a page of results from a GraphQL search query.
+
+    The query must include a %CURSOR% placeholder in the search arguments, and
+    request pageInfo { hasNextPage endCursor }.
+    """
+    client = client or get_github_client()
+    page_query = query.replace("%CURSOR%", f'after: "{cursor}"' if cursor else "")
+    return client.query(page_query)["search"]
+
+
+def github_search_nodes(query, cursor="", client=None):
+    """Yield nodes from a GraphQL search query, one page at a time."""
     while True:
-        r = requests.post(url=url, json=json_query, headers=headers)
-        try:
-            data = r.json()
-        except ValueError:
-            data = None
-
-        if data is not None and r.status_code == 200 and "errors" not in data:
-            return r
-
-        if attempt >= _retries:
-            reason = (
-                f"HTTP {r.status_code}, body: {r.text[:500]!r}"
-                if data is None
-                else f"GraphQL errors: {data.get('errors')}"
+        search = github_search_page(query, cursor, client)
+        yield from search["nodes"]
+        if not search["pageInfo"]["hasNextPage"]:
+            break
+        cursor = search["pageInfo"]["endCursor"]
+
+
+def github_search_range(query, start_date, end_date, workers=GITHUB_WORKERS):
+    """Yield nodes from a GraphQL search query over a range of dates.
+
+    GitHub returns at most GITHUB_SEARCH_LIMIT results for a search, so ranges
+    with more results are split in halves until each part fits. The first page
+    of each part is requested concurrently, then parts are yielded one page at
+    a time, oldest part first.
+
+    The query must include %START% and %END% placeholders (YYYY-MM-DD, e.g.
+    created:%START%..%END%), and request issueCount besides the requirements
+    of github_search_page().
+    """
+
+    def range_query(start, end):
+        return query.replace("%START%", start).replace("%END%", end)
+
+    def first_page(date_range):
+        return github_search_page(range_query(*date_range))
+
+    date_ranges = [(start_date, end_date)]
+    complete = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while date_ranges:
+            pages = list(executor.map(first_page, date_ranges))
+            split = []
+            for (start, end), page in zip(date_ranges, pages):
+                if page["issueCount"] <= GITHUB_SEARCH_LIMIT:
+                    complete.append(((start, end), page))
+                elif start == end:
+                    print(
+                        f"Warning: {page['issueCount']} search results on {start}, "
+                        f"only the first {GITHUB_SEARCH_LIMIT} can be retrieved"
+                    )
+                    complete.append(((start, end), page))
+                else:
+                    start_day = datetime.strptime(start, "%Y-%m-%d")
+                    days = (datetime.strptime(end, "%Y-%m-%d") - start_day).days
+                    middle = start_day + timedelta(days=days // 2)
+                    split.append((start, middle.strftime("%Y-%m-%d")))
+                    split.append(
+                        ((middle + timedelta(days=1)).strftime("%Y-%m-%d"), end)
+                    )
+            date_ranges = split
+
+    complete.sort(key=lambda item: item[0])
+    for date_range, page in complete:
+        yield from page["nodes"]
+        if page["pageInfo"]["hasNextPage"]:
+            yield from github_search_nodes(
+                range_query(*date_range), page["pageInfo"]["endCursor"]
             )
-            raise RuntimeError(
-                f"GitHub GraphQL request failed after {_retries} retries: {reason}"
+
+
+def github_complete_reviews(repo, nodes):
+    """Yield PR nodes in repo, after fetching reviews beyond the first page.
+
+    Search queries only request the first few reviews of each PR, to keep
+    their cost low. Nodes must include reviews { nodes pageInfo { hasNextPage
+    endCursor } }, and are updated in place.
+
+    Nodes with all their reviews are yielded right away, the others once
+    GITHUB_PRS_PER_QUERY of them are pending (or nodes run out), so the order
+    can change.
+    """
+    pr_query = """
+                pr%INDEX%: pullRequest(number: %NUMBER%) {
+                    reviews(first: 100, after: "%CURSOR%") {
+                        nodes {
+                            author {
+                                login
+                            }
+                            submittedAt
+                            state
+                        }
+                        pageInfo {
+                            hasNextPage
+                            endCursor
+                        }
+                    }
+                }
+    """
+    query = """
+        query {
+            repository(owner: "%OWNER%", name: "%NAME%") {
+                %PRS%
+            }
+            %RATE_LIMIT%
+        }
+    """
+    owner, name = repo.split("/")
+    query = (
+        query.replace("%OWNER%", owner)
+        .replace("%NAME%", name)
+        .replace("%RATE_LIMIT%", GITHUB_RATE_LIMIT_FIELD)
+    )
+
+    def complete(batch):
+        # A batch has at most GITHUB_PRS_PER_QUERY nodes, requested together
+        # until all their reviews are fetched.
+        while batch:
+            prs_query = "".join(
+                pr_query.replace("%INDEX%", str(index))
+                .replace("%NUMBER%", str(node["number"]))
+                .replace("%CURSOR%", node["reviews"]["pageInfo"]["endCursor"])
+                for index, node in enumerate(batch)
             )
+            repository = get_github_client().query(query.replace("%PRS%", prs_query))[
+                "repository"
+            ]
+            for index, node in enumerate(batch):
+                reviews = repository[f"pr{index}"]["reviews"]
+                node["reviews"]["nodes"].extend(reviews["nodes"])
+                node["reviews"]["pageInfo"] = reviews["pageInfo"]
+            batch = [
+                node for node in batch if node["reviews"]["pageInfo"]["hasNextPage"]
+            ]
+
+    pending = []
+    for node in nodes:
+        if not node["reviews"]["pageInfo"]["hasNextPage"]:
+            yield node
+            continue
+        pending.append(node)
+        if len(pending) == GITHUB_PRS_PER_QUERY:
+            complete(pending)
+            yield from pending
+            pending = []
+    complete(pending)
+    yield from pending
 
-        sleep_s = _backoff * (2**attempt) + random.uniform(0, 0.5)
-        time.sleep(sleep_s)
-        attempt += 1
 
+def get_jira_object(config=None):
+    from jira import JIRA
 
-def get_jira_object():
-    jira_email, jira_token, jira_server = read_config(key="jira")
+    jira_email, jira_token, jira_server = (config or load_config()).require(
+        "jira_email", "jira_token", "jira_server"
+    )
     return JIRA(
         basic_auth=(jira_email, jira_token),
         server=jira_server,
@@ -205,52 +679,529 @@ def get_json_file():
     return os.path.join(os.path.dirname(__file__), os.pardir, "data", "data.json")
 
 
+def _iter_phab_group_diffs(date_data):
+    """Yield (flag, diff_id) for a phab-groups record.
+
+    Old-format entries (flat list per user) are treated as both.
+    """
+    for group_data in date_data.values():
+        for user_data in group_data.get("details", {}).values():
+            if isinstance(user_data, list):
+                # Old format: flat list of [diff_id, time_h]
+                for diff_id, _ in user_data:
+                    yield "first_reviewed", diff_id
+                    yield "approved", diff_id
+            else:
+                for diff_id, _ in user_data.get("first_reviews", []):
+                    yield "first_reviewed", diff_id
+                for diff_id, _ in user_data.get("approvals", []):
+                    yield "approved", diff_id
+
+
+def _iter_phab_user_diffs(date_data):
+    """Yield (flag, diff_id) for an epm-reviews record."""
+    for user_data in date_data.get("phab-details", {}).values():
+        for diff_id in user_data.get("authored", []):
+            yield "authored", diff_id
+        for diff_id, _ in user_data.get("reviewed", []):
+            yield "reviewed", diff_id
+
+
+# Keys of data.json tracked in the known diffs index, with the function
+# extracting diff IDs from a record and the flags it can yield.
+KNOWN_DIFFS_KEYS = {
+    "phab-groups": (_iter_phab_group_diffs, ("first_reviewed", "approved")),
+    "epm-reviews": (_iter_phab_user_diffs, ("authored", "reviewed")),
+}
+
+
+def _atomic_write(file_name, write):
+    """Call write(f) on a temporary file, then move it to file_name."""
+    fd, tmp_name = tempfile.mkstemp(
+        dir=os.path.dirname(file_name),
+        prefix=f".{os.path.basename(file_name)}.",
+        suffix=".tmp",
+    )
+    try:
+        # mkstemp() creates the file with mode 0600: keep the existing mode,
+        # or use the default one for new files.
+        try:
+            mode = os.stat(file_name).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(fd, mode)
+        with os.fdopen(fd, "w") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, file_name)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+class JSONDataStore:
+    """Process-wide view of data/data.json.
+
+    data.json is a snapshot, and records stored after it are appended to a
+    journal file (data.jsonl), one JSON line per record. Reading replays the
+    journal on top of the snapshot, once per process, on first access. Stored
+    records are appended to the journal once, when the process exits. compact()
+    folds the journal back into data.json.
+
+    Files are written atomically (temporary file + rename), and accesses are
+    serialized across processes with an advisory lock, so scripts can store
+    records concurrently: extend=True records are merged when the journal is
+    replayed, and compact() re-reads the files while holding the lock.
+
+    Diffs recorded in phab-groups and epm-reviews are tracked in an index file,
+    with the diffs of each record ({key: {day: {record key: [[flag, diff_id],
+    ...]}}}), and the resulting {diff_id: {flag: first report day}} map used to
+    look up known diffs. The index stores the hash of the data.json snapshot it
+    was built from, and the journal offset it covers: journal lines appended
+    after that offset (e.g. by another process) are applied on top of it, and
+    it's rebuilt only if data.json changed (e.g. after a manual edit).
+    """
+
+    def __init__(self, json_file, journal_file, index_file):
+        self.json_file = json_file
+        self.journal_file = journal_file
+        self.index_file = index_file
+        self.lock_file = os.path.join(os.path.dirname(json_file), ".data.lock")
+        self.stats = {
+            "parse_count": 0,
+            "parse_time": 0.0,
+            "append_count": 0,
+            "write_count": 0,
+            "write_time": 0.0,
+        }
+        self._data = None
+        self._data_state = None
+        self._data_stat = None
+        self._pending = []
+        self._index = None
+        self._index_state = None
+        self._index_stat = None
+        # {diff_id: {flag: day}}, None if it needs to be rebuilt from the index.
+        self._diffs = None
+        self._known = {}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _file_lock(self, shared=False):
+        with open(self.lock_file, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _apply(json_data, key, record, day_str, extend):
+        if key not in json_data:
+            json_data[key] = {}
+        if extend:
+            data = json_data[key].get(day_str, {})
+            data.update(record)
+            json_data[key][day_str] = data
+        else:
+            json_data[key][day_str] = record
+
+    def _read_file(self, file_name):
+        if not os.path.isfile(file_name):
+            return b""
+        with open(file_name, "rb") as f:
+            return f.read()
+
+    def _snapshot_stat(self):
+        """Return an identifier of the current data.json file.
+
+        data.json is only replaced by renaming a new file over it, which
+        changes the inode. Unlike the hash, this can't be stored in the index,
+        as it's different in each checkout.
+        """
+        try:
+            st = os.stat(self.json_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def _snapshot_hash(json_bytes):
+        return hashlib.sha1(json_bytes).hexdigest()
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal_file)
+        except FileNotFoundError:
+            return 0
+
+    def _parse_journal(self, journal_bytes):
+        """Yield entries from complete journal lines."""
+        for line in journal_bytes.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Partial line left by an interrupted write.
+                print(f"Ignoring invalid line in {self.journal_file}: {line[:80]}")
+
+    def _read(self):
+        """Return (data, state, stat) from data.json and the journal.
+
+        state is {"snapshot", "journal_offset"} for the files read. Must be
+        called with the file lock held.
+        """
+        start = time.monotonic()
+        stat = self._snapshot_stat()
+        json_bytes = self._read_file(self.json_file)
+        journal_bytes = self._read_file(self.journal_file)
+        # Only complete lines are replayed.
+        journal_bytes = journal_bytes[: journal_bytes.rfind(b"\n") + 1]
+        json_data = json.loads(json_bytes) if json_bytes else {}
+        for entry in self._parse_journal(journal_bytes):
+            self._apply(
+                json_data,
+                entry["key"],
+                entry["record"],
+                entry["day"],
+                entry["extend"],
+            )
+        self.stats["parse_count"] += 1
+        self.stats["parse_time"] += time.monotonic() - start
+        state = {
+            "snapshot": self._snapshot_hash(json_bytes),
+            "journal_offset": len(journal_bytes),
+        }
+        return json_data, state, stat
+
+    @property
+    def data(self):
+        with self._lock:
+            if self._data is None:
+                with self._file_lock(shared=True):
+                    self._data, self._data_state, self._data_stat = self._read()
+            return self._data
+
+    @staticmethod
+    def _index_record(index, diffs, key, record, day_str, extend):
+        """Index the diffs of a record, like _apply() does for the data.
+
+        New diffs are added to diffs, if not None. Returns False if previously
+        indexed diffs were replaced, and diffs needs to be rebuilt.
+        """
+        extract, _ = KNOWN_DIFFS_KEYS[key]
+        # Diffs are grouped by record key, so that extend=True records only
+        # replace the keys they contain.
+        record_diffs = {
+            record_key: [
+                [flag, diff_id] for flag, diff_id in extract({record_key: value})
+            ]
+            for record_key, value in record.items()
+        }
+        days = index.setdefault(key, {})
+        previous = days.get(day_str, {})
+        day_diffs = dict(previous) if extend else {}
+        for record_key, entries in record_diffs.items():
+            if entries:
+                day_diffs[record_key] = entries
+            else:
+                day_diffs.pop(record_key, None)
+        days[day_str] = day_diffs
+        if any(
+            day_diffs.get(record_key) != previous[record_key] for record_key in previous
+        ):
+            return False
+
+        if diffs is not None:
+            for entries in record_diffs.values():
+                for flag, diff_id in entries:
+                    flags = diffs.setdefault(diff_id, {})
+                    if flag not in flags or day_str < flags[flag]:
+                        flags[flag] = day_str
+        return True
+
+    def _build_index(self, json_data):
+        index = {}
+        for key in KNOWN_DIFFS_KEYS:
+            for day_str, date_data in json_data.get(key, {}).items():
+                self._index_record(index, None, key, date_data, day_str, False)
+        return index
+
+    def _set_index(self, index, diffs=None):
+        self._index = index
+        self._diffs = diffs
+        self._known = {}
+
+    @property
+    def diffs(self):
+        """Return {diff_id: {flag: first report day}} for indexed diffs."""
+        with self._lock:
+            if self._diffs is None:
+                diffs = {}
+                for day_diffs in self.index.values():
+                    for day_str, record_diffs in day_diffs.items():
+                        for entries in record_diffs.values():
+                            for flag, diff_id in entries:
+                                flags = diffs.setdefault(diff_id, {})
+                                if flag not in flags or day_str < flags[flag]:
+                                    flags[flag] = day_str
+                self._diffs = diffs
+            return self._diffs
+
+    def _load_index(self):
+        """Return (index, diffs, state, stat, updated) from the index file.
+
+        Returns None if the index file is missing or outdated.
+
+        Journal lines appended after the offset covered by the index are
+        applied to it. Must be called with the file lock held.
+        """
+        index_bytes = self._read_file(self.index_file)
+        index_data = json.loads(index_bytes) if index_bytes else {}
+        if "records" not in index_data:
+            return None
+        state = index_data["state"]
+        stat = self._snapshot_stat()
+        if state["snapshot"] != self._snapshot_hash(self._read_file(self.json_file)):
+            return None
+        journal_size = self._journal_size()
+        if journal_size < state["journal_offset"]:
+            return None
+        index = index_data["records"]
+        diffs = index_data.get("diffs")
+        if journal_size == state["journal_offset"]:
+            return index, diffs, state, stat, False
+
+        with open(self.journal_file, "rb") as f:
+            f.seek(state["journal_offset"])
+            journal_bytes = f.read()
+        journal_bytes = journal_bytes[: journal_bytes.rfind(b"\n") + 1]
+        updated = False
+        for entry in self._parse_journal(journal_bytes):
+            if entry["key"] in KNOWN_DIFFS_KEYS:
+                if not self._index_record(
+                    index,
+                    diffs,
+                    entry["key"],
+                    entry["record"],
+                    entry["day"],
+                    entry["extend"],
+                ):
+                    diffs = None
+                updated = True
+        state = {
+            "snapshot": state["snapshot"],
+            "journal_offset": state["journal_offset"] + len(journal_bytes),
+        }
+        return index, diffs, state, stat, updated
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                with self._file_lock(shared=True):
+                    loaded = self._load_index()
+                if loaded is None:
+                    print("Rebuilding known diffs index...")
+                    json_data = self.data
+                    self._set_index(self._build_index(json_data))
+                    self._index_state = dict(self._data_state)
+                    self._index_stat = self._data_stat
+                    updated = True
+                else:
+                    index, diffs, self._index_state, self._index_stat, updated = loaded
+                    self._set_index(index, diffs)
+                if updated:
+                    with self._file_lock():
+                        self._write_index()
+            return self._index
+
+    def _write_index(self):
+        """Write the index, with the state of the files it reflects.
+
+        Must be called with the file lock held.
+        """
+        _atomic_write(
+            self.index_file,
+            lambda f: write_json(
+                {
+                    "diffs": self.diffs,
+                    "records": self._index,
+                    "state": self._index_state,
+                },
+                f,
+            ),
+        )
+
+    def known_diffs(self, key):
+        """Return {flag: frozenset of diff IDs} already recorded for key."""
+        with self._lock:
+            if key not in self._known:
+                _, flags = KNOWN_DIFFS_KEYS[key]
+                known = {flag: set() for flag in flags}
+                for diff_id, diff_flags in self.diffs.items():
+                    for flag in diff_flags:
+                        if flag in known:
+                            known[flag].add(diff_id)
+                self._known[key] = {
+                    flag: frozenset(diff_ids) for flag, diff_ids in known.items()
+                }
+            return dict(self._known[key])
+
+    def store(self, key, record, day_str, extend=False):
+        with self._lock:
+            if key in KNOWN_DIFFS_KEYS:
+                index = self.index
+                if not self._index_record(
+                    index, self._diffs, key, record, day_str, extend
+                ):
+                    self._diffs = None
+                self._known = {}
+            self._apply(self.data, key, record, day_str, extend)
+            self._pending.append(
+                {"day": day_str, "extend": extend, "key": key, "record": record}
+            )
+
+    def _append_pending(self):
+        """Append pending records to the journal.
+
+        Must be called with the file lock held.
+        """
+        if not self._pending:
+            return
+        start = time.monotonic()
+        journal_offset = self._journal_size()
+        indexed = any(entry["key"] in KNOWN_DIFFS_KEYS for entry in self._pending)
+        with open(self.journal_file, "a") as f:
+            f.write(
+                "".join(
+                    json.dumps(entry, sort_keys=True) + "\n" for entry in self._pending
+                )
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        self.stats["append_count"] += len(self._pending)
+        self.stats["write_time"] += time.monotonic() - start
+        self._pending = []
+        # Only update the index if no other process changed the files since
+        # it was loaded, otherwise the next run applies the journal on top of
+        # the stored index. The file is only rewritten if indexed keys changed.
+        if (
+            self._index is not None
+            and self._index_state["journal_offset"] == journal_offset
+            and self._index_stat == self._snapshot_stat()
+        ):
+            self._index_state["journal_offset"] = self._journal_size()
+            if indexed:
+                self._write_index()
+
+    def _write(self, json_data):
+        """Write json_data as the data.json snapshot, and clear the journal.
+
+        Must be called with the file lock held.
+        """
+        start = time.monotonic()
+        _atomic_write(self.json_file, lambda f: write_json(json_data, f))
+        if os.path.isfile(self.journal_file):
+            os.remove(self.journal_file)
+        self.stats["write_count"] += 1
+        self.stats["write_time"] += time.monotonic() - start
+        self._data = json_data
+        self._data_state = {
+            "snapshot": self._snapshot_hash(self._read_file(self.json_file)),
+            "journal_offset": 0,
+        }
+        self._data_stat = self._snapshot_stat()
+        self._pending = []
+        self._set_index(self._build_index(json_data))
+        self._index_state = dict(self._data_state)
+        self._index_stat = self._data_stat
+        self._write_index()
+
+    def write(self, json_data):
+        """Replace data.json with json_data, and clear the journal."""
+        with self._lock, self._file_lock():
+            self._write(json_data)
+
+    def compact(self):
+        """Fold the journal into data.json."""
+        with self._lock, self._file_lock():
+            self._append_pending()
+            # Re-read the files, in case another process stored records.
+            json_data, _, _ = self._read()
+            self._write(json_data)
+
+    def flush(self):
+        """Append records stored by this process to the journal."""
+        with self._lock:
+            if self._pending:
+                with self._file_lock():
+                    self._append_pending()
+
+    def print_stats(self):
+        stats = self.stats
+        print(
+            f"\ndata.json: parsed {stats['parse_count']} time(s) in "
+            f"{stats['parse_time']:.3f}s, {stats['append_count']} record(s) "
+            f"appended, written {stats['write_count']} time(s), "
+            f"{stats['write_time']:.3f}s writing"
+        )
+
+
+def _close_data_store():
+    if _data_store is not None:
+        _data_store.flush()
+        stats = _data_store.stats
+        if stats["parse_count"] or stats["append_count"] or stats["write_count"]:
+            _data_store.print_stats()
+
+
+def close_json_data():
+    """Append stored records to the journal, and reset the data store.
+
+    Used when running several scripts in the same process.
+    """
+    global _data_store
+    with _data_store_lock:
+        _close_data_store()
+        _data_store = None
+
+
+def get_data_store():
+    """Return the data store shared by the whole process."""
+    global _data_store
+    with _data_store_lock:
+        if _data_store is None:
+            data_folder = os.path.dirname(get_json_file())
+            _data_store = JSONDataStore(
+                get_json_file(),
+                os.path.join(data_folder, "data.jsonl"),
+                os.path.join(data_folder, "known_diffs.json"),
+            )
+            atexit.register(_close_data_store)
+        return _data_store
+
+
 def get_known_phab_group_diffs():
     """Return sets of diff IDs already recorded in phab-groups output.
 
     Returns {"first_reviewed": set, "approved": set}.
     Old-format entries (flat list per user) are treated as both.
     """
-    data = get_json_data()
-    first_reviewed = set()
-    approved = set()
-    for date_data in data.get("phab-groups", {}).values():
-        for group_data in date_data.values():
-            for user_data in group_data.get("details", {}).values():
-                if isinstance(user_data, list):
-                    # Old format: flat list of [diff_id, time_h]
-                    for diff_id, _ in user_data:
-                        first_reviewed.add(diff_id)
-                        approved.add(diff_id)
-                else:
-                    for diff_id, _ in user_data.get("first_reviews", []):
-                        first_reviewed.add(diff_id)
-                    for diff_id, _ in user_data.get("approvals", []):
-                        approved.add(diff_id)
-    return {"first_reviewed": first_reviewed, "approved": approved}
+    return get_data_store().known_diffs("phab-groups")
 
 
 def get_known_phab_user_diffs():
     """Return sets of diff IDs already recorded in epm-reviews output."""
-    data = get_json_data()
-    authored = set()
-    reviewed = set()
-    for date_data in data.get("epm-reviews", {}).values():
-        for user_data in date_data.get("phab-details", {}).values():
-            for diff_id in user_data.get("authored", []):
-                authored.add(diff_id)
-            for diff_id, _ in user_data.get("reviewed", []):
-                reviewed.add(diff_id)
-    return {"authored": authored, "reviewed": reviewed}
+    return get_data_store().known_diffs("epm-reviews")
 
 
 def get_json_data():
-    json_file = get_json_file()
-    if not os.path.isfile(json_file):
-        return {}
-    else:
-        with open(json_file) as f:
-            return json.load(f)
+    return get_data_store().data
 
 
 def get_gh_usernames():
@@ -270,58 +1221,249 @@ def get_phab_usernames():
     }
 
 
+def get_phab_review_group_names():
+    return ["android-l10n-reviewers", "fluent-reviewers"]
+
+
 def write_json_data(json_data):
-    json_file = get_json_file()
+    get_data_store().write(json_data)
+
 
-    with open(json_file, "w+") as f:
-        f.write(json.dumps(json_data, cls=InlineListEncoder, indent=2, sort_keys=True))
+def compact_json_data():
+    """Fold records appended to the journal into data.json."""
+    get_data_store().compact()
 
 
 def store_json_data(key, record, day=None, extend=False):
-    json_data = get_json_data()
+    # The record is appended to the journal when the process exits.
     if not day:
         day = datetime.today()
-    day_str = day.strftime("%Y-%m-%d")
-    if key not in json_data:
-        json_data[key] = {}
-    if extend:
-        data = json_data[key].get(day_str, {})
-        data.update(record)
-        json_data[key][day_str] = data
-    else:
-        json_data[key][day_str] = record
+    get_data_store().store(key, record, day.strftime("%Y-%m-%d"), extend=extend)
 
-    write_json_data(json_data)
 
-
-def phab_search_revisions(search_constraints):
+def phab_search_revisions(search_constraints, attachments=None):
     revisions_response = {}
     phab_query(
         "differential.revision.search",
         revisions_response,
         constraints=search_constraints,
         order="newest",
+        **({"attachments": attachments} if attachments else {}),
     )
 
     return revisions_response.get("results", [])
 
 
-def phab_diff_transactions(id, phid):
+def _phab_search_created_or_modified(
+    search_constraints, start_timestamp, end_timestamp, attachments=None
+):
+    """Return {id: revision} from separate created and modified searches."""
+    created_revisions = phab_search_revisions(
+        {
+            **search_constraints,
+            "createdStart": start_timestamp,
+            "createdEnd": end_timestamp,
+        },
+        attachments,
+    )
+    modified_revisions = phab_search_revisions(
+        {
+            **search_constraints,
+            "modifiedStart": start_timestamp,
+            "modifiedEnd": end_timestamp,
+        },
+        attachments,
+    )
+    return {d["id"]: d for d in created_revisions + modified_revisions}
+
+
+def phab_search_window(
+    search_constraints, start_timestamp, end_timestamp, attachments=None, check=False
+):
+    """Return revisions created or modified within the date range.
+
+    A revision is modified after it's created, so revisions modified after the
+    start and created before the end are a superset of the ones created or
+    modified within the range. This superset is fetched with a single query and
+    filtered locally. With check=True, the result is compared with the union
+    of separate created/modified searches.
+
+    The superset includes everything modified up to now, so for ranges ending
+    more than PHAB_SINGLE_PASS_MAX_AGE ago the two bounded searches are used
+    instead.
+    """
+    if end_timestamp < time.time() - PHAB_SINGLE_PASS_MAX_AGE:
+        return list(
+            _phab_search_created_or_modified(
+                search_constraints, start_timestamp, end_timestamp, attachments
+            ).values()
+        )
+
+    start = time.monotonic()
+    window_revisions = phab_search_revisions(
+        {
+            **search_constraints,
+            "modifiedStart": start_timestamp,
+            "createdEnd": end_timestamp,
+        },
+        attachments,
+    )
+    revisions = {
+        d["id"]: d
+        for d in window_revisions
+        if start_timestamp <= d["fields"]["dateCreated"] <= end_timestamp
+        or start_timestamp <= d["fields"]["dateModified"] <= end_timestamp
+    }
+    elapsed = time.monotonic() - start
+
+    if check:
+        start = time.monotonic()
+        union_ids = _phab_search_created_or_modified(
+            search_constraints, start_timestamp, end_timestamp, attachments
+        ).keys()
+        union_elapsed = time.monotonic() - start
+        print(
+            f"Single-pass search: {len(revisions)} revisions in {elapsed:.2f}s, "
+            f"created/modified searches: {len(union_ids)} revisions in "
+            f"{union_elapsed:.2f}s"
+        )
+        if union_ids != revisions.keys():
+            raise RuntimeError(
+                "Single-pass search doesn't match created/modified searches: "
+                f"missing {sorted(union_ids - revisions.keys())}, "
+                f"extra {sorted(revisions.keys() - union_ids)}"
+            )
+
+    return list(revisions.values())
+
+
+def phab_search_revisions_by(
+    constraint, phids, start_timestamp, end_timestamp, check=False
+):
+    """Search revisions for several authors or reviewers at once.
+
+    constraint is either "authorPHIDs" or "reviewerPHIDs". Revisions are
+    searched for all PHIDs with a single window search, then assigned to each
+    PHID based on the author or the reviewers (users or groups).
+
+    Returns {phid: [revisions]}.
+    """
+    attachments = {"reviewers": True} if constraint == "reviewerPHIDs" else None
+    unique_revisions = phab_search_window(
+        {constraint: phids},
+        start_timestamp,
+        end_timestamp,
+        attachments,
+        check,
+    )
+
+    revisions = {phid: [] for phid in phids}
+    for revision in unique_revisions:
+        if constraint == "authorPHIDs":
+            revision_phids = {revision["fields"]["authorPHID"]}
+        else:
+            revision_phids = {
+                reviewer["reviewerPHID"]
+                for reviewer in revision["attachments"]["reviewers"]["reviewers"]
+            }
+        for phid in revision_phids & revisions.keys():
+            revisions[phid].append(revision)
+
+    return revisions
+
+
+def phab_search_user_revisions(user_phids, start_timestamp, end_timestamp, check=False):
+    """Search revisions authored or reviewed by any of the users at once.
+
+    Returns {"authored": {phid: [revisions]}, "reviewed": {phid: [revisions]}}.
+    """
+    user_revisions = {}
+    for type, constraint in (
+        ("authored", "authorPHIDs"),
+        ("reviewed", "reviewerPHIDs"),
+    ):
+        print(f"Getting revisions {type} by users within the date range...")
+        user_revisions[type] = phab_search_revisions_by(
+            constraint, user_phids, start_timestamp, end_timestamp, check
+        )
+
+    return user_revisions
+
+
+def phab_diff_transactions(id, phid, closed=False, modified=None):
     # Fetch transactions related to the revision. Use local cache if available.
+    # Transactions of closed revisions are cached indefinitely, unless the
+    # revision was modified since (e.g. reopened or reclaimed).
     transactions_response = get_transactions(id)
-    if not transactions_response:
-        transactions_response = {}
-        print(f"Getting transactions for {id}...")
+    if transactions_response and (
+        modified is None or modified < transactions_response.get("fetched", 0)
+    ):
+        print(f"Using cached transactions for {id}...")
+        return transactions_response.get("results", [])
+
+    # For expired entries, only fetch transactions newer than the last cached
+    # one, or nothing at all if the revision wasn't modified since then.
+    fetched = time.time() - PHAB_CLOCK_SKEW
+    stale_response = get_stale_transactions(id) or {}
+    cursor = stale_response.get("cursor")
+    if cursor and modified is not None and modified < stale_response["fetched"]:
+        print(f"No new transactions for {id}...")
+        transactions_response = stale_response
+    elif cursor:
+        print(f"Getting new transactions for {id}...")
+        transactions_response = {"results": stale_response.get("results", [])}
         phab_query(
             "transaction.search",
             transactions_response,
+            before=cursor,
             objectIdentifier=phid,
         )
-        set_transactions(id, transactions_response)
     else:
-        print(f"Using cached transactions for {id}...")
+        print(f"Getting transactions for {id}...")
+        transactions_response = {}
+        phab_query(
+            "transaction.search",
+            transactions_response,
+            objectIdentifier=phid,
+        )
+
+    # Transactions are sorted from newest to oldest, store the newest ID as
+    # cursor for the next incremental fetch.
+    results = transactions_response.get("results", [])
+    set_transactions(
+        id,
+        {
+            "results": results,
+            "cursor": results[0]["id"] if results else None,
+            "fetched": fetched,
+        },
+        closed=closed,
+    )
+
+    return results
+
+
+def phab_prefetch_transactions(revisions, workers=PHAB_WORKERS):
+    """Fetch transactions for several revisions concurrently.
+
+    Returns {revision_id: transactions}, using the same cache as
+    phab_diff_transactions().
+    """
 
-    return transactions_response.get("results", [])
+    def fetch(revision):
+        return phab_diff_transactions(
+            f"D{revision['id']}",
+            revision["phid"],
+            closed=revision["fields"]["status"]["closed"],
+            modified=revision["fields"]["dateModified"],
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        transactions = executor.map(fetch, revisions)
+        return {
+            f"D{revision['id']}": revision_transactions
+            for revision, revision_transactions in zip(revisions, transactions)
+        }
 
 
 def get_phab_review_groups(group_names):
@@ -372,149 +1514,312 @@ def get_phab_review_groups(group_names):
     return groups
 
 
-def phab_query(method: str, data: dict, after=None, **kwargs) -> dict:
-    timeout = kwargs.pop("_timeout", 10)
-    retries = kwargs.pop("_retries", 3)
-    backoff = kwargs.pop("_backoff", 0.8)
-
-    phab_token, server, user_agent = read_config("phab")
-    # Ensure no trailing slash or /api suffix
-    server = server.rstrip("/").removesuffix("/api")
-    url = f"{server}/api/{method}"
-
-    results = data.get("results", [])
-    cursor_after = after
-
-    http = urllib3.PoolManager(
-        timeout=urllib3.Timeout(total=timeout),
-        retries=False,
-        headers={
-            "User-Agent": user_agent,
-            "Accept": "application/json",
-            "Cache-Control": "no-cache",
-            "Pragma": "no-cache",
-            "Content-Type": "application/x-www-form-urlencoded",
-        },
-    )
+class ConduitClient:
+    """Conduit API client sharing a keep-alive connection pool across calls.
 
-    while True:
-        params_obj = dict(kwargs)
-        params_obj["__conduit__"] = {"token": phab_token}
-        if cursor_after is not None:
-            params_obj["after"] = cursor_after
-
-        payload = {
-            "api.token": phab_token,
-            "output": "json",
-            "params": json.dumps(params_obj),
-            "__conduit__": "true",
+    A 429 response pauses requests from all threads until the back-off delay
+    has passed. Usage statistics are collected in self.stats.
+    """
+
+    def __init__(self, token, server, user_agent, pool_size=PHAB_POOL_SIZE, timeout=10):
+        # urllib3 is imported on first use, to keep startup fast for scripts
+        # that don't query Phabricator.
+        import urllib3
+
+        self.token = token
+        # Ensure no trailing slash or /api suffix
+        self.server = server.rstrip("/").removesuffix("/api")
+        self.http = urllib3.PoolManager(
+            maxsize=pool_size,
+            retries=False,
+            timeout=urllib3.Timeout(total=timeout),
+            headers={
+                "User-Agent": user_agent,
+                "Accept": "application/json",
+                "Cache-Control": "no-cache",
+                "Pragma": "no-cache",
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+        )
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+            "latency": [0] * (len(LATENCY_BUCKETS) + 1),
         }
+        self._lock = threading.Lock()
+        self._backoff_until = 0.0
+        self._network_error = urllib3.exceptions.HTTPError
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            *config.require(
+                "phabricator_token", "phabricator_server", "phabricator_user_agent"
+            )
+        )
 
-        body = urllib.parse.urlencode(payload)
+    def _wait_backoff(self):
+        delay = self._backoff_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _set_backoff(self, sleep_s):
+        with self._lock:
+            self._backoff_until = max(self._backoff_until, time.time() + sleep_s)
+
+    def _post(self, url, body):
+        self._wait_backoff()
+        start = time.monotonic()
+        resp = self.http.request("POST", url, body=body, redirect=False)
+        bucket = _latency_bucket(time.monotonic() - start)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_sent"] += len(body)
+            self.stats["bytes_received"] += len(resp.data or b"")
+            self.stats["latency"][bucket] += 1
+        return resp
+
+    def _count_retry(self):
+        with self._lock:
+            self.stats["retries"] += 1
+
+    def query(self, method: str, data: dict, after=None, before=None, **kwargs):
+        retries = kwargs.pop("_retries", 3)
+        backoff = kwargs.pop("_backoff", 0.8)
+
+        url = f"{self.server}/api/{method}"
+
+        results = data.get("results", [])
+        cursor_after = after
+        cursor_before = before
 
-        attempt = 0
         while True:
-            try:
-                resp = http.request("POST", url, body=body, redirect=False)
-                status = resp.status
-                text = (resp.data or b"").decode("utf-8", errors="replace")
-
-                if status in (301, 302, 303, 307, 308):
-                    raise RuntimeError(
-                        f"HTTP redirect {status} calling {url}. "
-                        f"Location: {resp.headers.get('Location')}"
-                    )
+            params_obj = dict(kwargs)
+            params_obj["__conduit__"] = {"token": self.token}
+            if cursor_before is not None:
+                params_obj["before"] = cursor_before
+            elif cursor_after is not None:
+                params_obj["after"] = cursor_after
+
+            payload = {
+                "api.token": self.token,
+                "output": "json",
+                "params": json.dumps(params_obj),
+                "__conduit__": "true",
+            }
 
-                if status == 429:
-                    retry_after = resp.headers.get("Retry-After")
-                    sleep_s = (
-                        int(retry_after)
-                        if retry_after and str(retry_after).isdigit()
-                        else backoff * (2**attempt) + random.uniform(0, 0.5)
-                    )
-                    if attempt >= retries:
+            body = urllib.parse.urlencode(payload)
+
+            attempt = 0
+            while True:
+                try:
+                    resp = self._post(url, body)
+                    status = resp.status
+                    text = (resp.data or b"").decode("utf-8", errors="replace")
+
+                    if status in (301, 302, 303, 307, 308):
+                        raise RuntimeError(
+                            f"HTTP redirect {status} calling {url}. "
+                            f"Location: {resp.headers.get('Location')}"
+                        )
+
+                    if status == 429:
+                        retry_after = resp.headers.get("Retry-After")
+                        sleep_s = (
+                            int(retry_after)
+                            if retry_after and str(retry_after).isdigit()
+                            else backoff * (2**attempt) + random.uniform(0, 0.5)
+                        )
+                        if attempt >= retries:
+                            raise RuntimeError(
+                                f"HTTP 429 Too Many Requests calling {url}\n"
+                                f"Retry-After: {retry_after}\n"
+                                f"Body (first 1000 chars):\n{text[:1000]}"
+                            )
+                        self._set_backoff(sleep_s)
+                        self._count_retry()
+                        attempt += 1
+                        continue
+
+                    if not (200 <= status < 300):
                         raise RuntimeError(
-                            f"HTTP 429 Too Many Requests calling {url}\n"
-                            f"Retry-After: {retry_after}\n"
+                            f"HTTP {status} calling {url}\n"
                             f"Body (first 1000 chars):\n{text[:1000]}"
                         )
-                    time.sleep(sleep_s)
+
+                    try:
+                        res = json.loads(text)
+                    except json.JSONDecodeError as e:
+                        raise RuntimeError(
+                            f"JSON decode error calling {url}: {e}\n"
+                            f"Body (first 1000 chars):\n{text[:1000]}"
+                        ) from e
+
+                    break
+                except self._network_error as e:
+                    if attempt >= retries:
+                        raise RuntimeError(
+                            f"Network error after {retries + 1} attempts calling {url}: {e}"
+                        ) from e
+                    time.sleep(backoff * (2**attempt) + random.uniform(0, 0.5))
+                    self._count_retry()
                     attempt += 1
-                    continue
 
-                if not (200 <= status < 300):
-                    raise RuntimeError(
-                        f"HTTP {status} calling {url}\n"
-                        f"Body (first 1000 chars):\n{text[:1000]}"
-                    )
+            if res.get("error_code") or res.get("error_info"):
+                raise RuntimeError(
+                    f"Conduit error {res.get('error_code')}: {res.get('error_info')}"
+                )
 
-                try:
-                    res = json.loads(text)
-                except json.JSONDecodeError as e:
-                    raise RuntimeError(
-                        f"JSON decode error calling {url}: {e}\n"
-                        f"Body (first 1000 chars):\n{text[:1000]}"
-                    ) from e
-
-                break
-            except urllib3.exceptions.HTTPError as e:
-                if attempt >= retries:
-                    raise RuntimeError(
-                        f"Network error after {retries + 1} attempts calling {url}: {e}"
-                    ) from e
-                time.sleep(backoff * (2**attempt) + random.uniform(0, 0.5))
-                attempt += 1
+            result = res.get("result") or {}
+            cursor = result.get("cursor") or {}
+            if cursor_before is not None:
+                # Pages are returned from oldest to newest.
+                results[0:0] = result.get("data") or []
+                cursor_before = cursor.get("before")
+                if not cursor_before:
+                    break
+            else:
+                results.extend(result.get("data") or [])
+                cursor_after = cursor.get("after")
+                if not cursor_after:
+                    break
 
-        if res.get("error_code") or res.get("error_info"):
-            raise RuntimeError(
-                f"Conduit error {res.get('error_code')}: {res.get('error_info')}"
-            )
+        data["results"] = results
+        return data
 
-        result = res.get("result") or {}
-        results.extend(result.get("data") or [])
+    def print_stats(self):
+        stats = self.stats
+        print(
+            f"\nConduit: {stats['requests']} requests, {stats['retries']} retries, "
+            f"{stats['bytes_sent'] / 1024:.1f} KB sent, "
+            f"{stats['bytes_received'] / 1024:.1f} KB received"
+        )
+        print(_format_latency(stats["latency"]))
 
-        cursor_after = (result.get("cursor") or {}).get("after")
-        if not cursor_after:
-            break
 
-    data["results"] = results
-    return data
+def get_conduit_client():
+    """Return the Conduit client shared by the whole process."""
+    global _conduit_client
+    with _conduit_client_lock:
+        if _conduit_client is None:
+            _conduit_client = ConduitClient.from_config(load_config())
+        return _conduit_client
+
+
+def print_conduit_stats():
+    """Print Conduit usage statistics, if any request was made."""
+    if _conduit_client is not None:
+        _conduit_client.print_stats()
+
+
+def reset_api_clients():
+    """Drop the shared GitHub and Conduit clients, and their statistics.
+
+    Used when running several scripts in the same process.
+    """
+    global _conduit_client, _github_client
+    with _conduit_client_lock:
+        if _conduit_client is not None:
+            _conduit_client.http.clear()
+        _conduit_client = None
+    with _github_client_lock:
+        if _github_client is not None:
+            _github_client.session.close()
+        _github_client = None
+
+
+def phab_query(method: str, data: dict, after=None, before=None, **kwargs) -> dict:
+    """Run a Conduit query, following cursors until all pages are fetched.
+
+    Results are accumulated in data["results"]. If `before` is set, only
+    results newer than that cursor are fetched, and prepended to existing
+    results (Conduit returns newest results first).
+    """
+    return get_conduit_client().query(
+        method, data, after=after, before=before, **kwargs
+    )
 
 
 def get_user_pr_collection(period_data, start_date):
-    usernames = get_gh_usernames()
+    """Store PRs reviewed and created by each user since start_date.
+
+    Users are queried in batches of GITHUB_USERS_PER_QUERY, using one alias
+    per user. Returns (missing, failed): users with a permanent error (e.g. a
+    renamed account), and users in batches that failed after retries.
+    """
+    usernames = list(get_gh_usernames().keys())
     print(f"Requesting data since: {start_date.strftime('%Y-%m-%d')}")
-    for username in usernames.keys():
-        replacements = {"%USER%": username, "%START%": start_date.isoformat()}
-        try:
-            query = """
-                query {
-                    user(login: "%USER%") {
-                        contributionsCollection(from: "%START%") {
-                            pullRequestReviewContributionsByRepository(maxRepositories: 100) {
-                                contributions {
-                                    totalCount
-                                }
-                                repository {
-                                    nameWithOwner
-                                }
-                            }
-                            pullRequestContributionsByRepository(maxRepositories: 100) {
-                                contributions {
-                                    totalCount
-                                }
-                                repository {
-                                    nameWithOwner
-                                }
-                            }
-                        }
+    user_query = """
+        user%INDEX%: user(login: "%USER%") {
+            ...contributions
+        }
+    """
+    query = """
+        query {
+            %USERS%
+            %RATE_LIMIT%
+        }
+
+        fragment contributions on User {
+            contributionsCollection(from: "%START%") {
+                pullRequestReviewContributionsByRepository(maxRepositories: 100) {
+                    contributions {
+                        totalCount
+                    }
+                    repository {
+                        nameWithOwner
+                    }
+                }
+                pullRequestContributionsByRepository(maxRepositories: 100) {
+                    contributions {
+                        totalCount
+                    }
+                    repository {
+                        nameWithOwner
                     }
                 }
-            """
-            for placeholder, value in replacements.items():
-                query = query.replace(placeholder, value)
-            r = github_api_request(query)
-            json_data = r.json()["data"]["user"]["contributionsCollection"]
+            }
+        }
+    """
+    query = query.replace("%START%", start_date.isoformat()).replace(
+        "%RATE_LIMIT%", GITHUB_RATE_LIMIT_FIELD
+    )
+
+    missing = []
+    failed = []
+    for chunk_start in range(0, len(usernames), GITHUB_USERS_PER_QUERY):
+        chunk = usernames[chunk_start : chunk_start + GITHUB_USERS_PER_QUERY]
+        users_query = "".join(
+            user_query.replace("%INDEX%", str(index)).replace("%USER%", username)
+            for index, username in enumerate(chunk)
+        )
+        try:
+            response = get_github_client().post(
+                query.replace("%USERS%", users_query), partial=True
+            )[1]
+        except Exception as e:
+            print(f"Error requesting data for {', '.join(chunk)}: {e}")
+            failed.extend(chunk)
+            continue
+
+        # Errors for a single user have the alias as first element of the path.
+        errors = defaultdict(list)
+        for error in response.get("errors", []):
+            errors[(error.get("path") or [None])[0]].append(error.get("message"))
+        for error in errors.pop(None, []):
+            print(f"Error requesting data for {', '.join(chunk)}: {error}")
+
+        for index, username in enumerate(chunk):
+            alias = f"user{index}"
+            user_data = response["data"].get(alias)
+            if user_data is None or alias in errors:
+                messages = "; ".join(errors.get(alias, ["no data returned"]))
+                print(f"Error requesting data for {username}: {messages}")
+                missing.append(username)
+                continue
+            json_data = user_data["contributionsCollection"]
 
             # Get reviews
             total_reviewed = 0
@@ -535,19 +1840,31 @@ def get_user_pr_collection(period_data, start_date):
                 total_created += count
                 period_data["pr_created"][username][repo_name] = count
             period_data["pr_created"][username]["total"] = total_created
-        except Exception as e:
-            print(e)
 
+    if missing or failed:
+        print(f"Warning: no data for {', '.join(missing + failed)}")
+
+    return missing, failed
 
-def get_pr_details(repos, usernames, start_date, end_date, pr_stats, single_repo=False):
+
+def get_pr_details(
+    repos,
+    usernames,
+    start_date,
+    end_date,
+    pr_stats,
+    single_repo=False,
+    workers=GITHUB_WORKERS,
+):
     query_prs = """
 {
   search(
     first: 100
-    query: "repo:%REPO% is:pr created:%START%..%END%"
+    query: "repo:%REPO% is:pr created:%START%..%END%%UPDATED%"
     type: ISSUE
     %CURSOR%
   ) {
+    issueCount
     nodes {
       ... on PullRequest {
         number
@@ -559,7 +1876,7 @@ def get_pr_details(repos, usernames, start_date, end_date, pr_stats, single_repo
         closedAt
         merged
         reviewDecision
-        reviews(first: 100) {
+        reviews(first: 20) {
           nodes {
             author {
               login
@@ -567,6 +1884,10 @@ def get_pr_details(repos, usernames, start_date, end_date, pr_stats, single_repo
             submittedAt
             state
           }
+          pageInfo {
+            hasNextPage
+            endCursor
+          }
         }
       }
     }
@@ -576,29 +1897,100 @@ def get_pr_details(repos, usernames, start_date, end_date, pr_stats, single_repo
       endCursor
     }
   }
+  %RATE_LIMIT%
 }
 """
 
-    start_query = start_date - timedelta(weeks=6)
-    query_prs = query_prs.replace("%START%", start_query.strftime("%Y-%m-%d"))
-    if end_date:
-        query_prs = query_prs.replace("%END%", end_date.strftime("%Y-%m-%d"))
+    query_prs = query_prs.replace("%RATE_LIMIT%", GITHUB_RATE_LIMIT_FIELD)
 
-    for repo in repos:
+    def fetch(repo):
         print(f"Requesting data for {repo}")
-        query_pr_data(start_date, repo, usernames, query_prs, pr_stats, single_repo)
+        repo_stats = defaultdict(lambda: defaultdict(dict))
+        query_pr_data(
+            start_date, end_date, repo, usernames, query_prs, repo_stats, single_repo
+        )
+        return repo_stats
 
+    # Repositories are fetched concurrently, sharing the client's rate limit,
+    # and merged in order.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for repo_stats in executor.map(fetch, repos):
+            merge_pr_stats(pr_stats, repo_stats)
 
-def query_pr_data(start_date, repo, usernames, query, pr_stats, single_repo, cursor=""):
-    repo_query = query.replace("%REPO%", repo)
-    if cursor != "":
-        repo_query = repo_query.replace("%CURSOR%", f'after: "{cursor}"')
-    else:
-        repo_query = repo_query.replace("%CURSOR%", "")
 
-    r = github_api_request(repo_query)
-    r_data = r.json()["data"]["search"]
-    for node in r_data["nodes"]:
+def get_cached_prs(repo, query, start_date, end_date):
+    """Yield PR nodes created in repo between start_date and end_date.
+
+    PRs are stored in github_cache. Only PRs created outside the cached range
+    are fully fetched, while for the cached range only PRs updated since the
+    last fetch (e.g. with new reviews) are requested.
+
+    The query must include %REPO% and %UPDATED% (additional search qualifier)
+    placeholders, besides the requirements of github_search_range().
+    """
+
+    def shift(day, days):
+        return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=days)).strftime(
+            "%Y-%m-%d"
+        )
+
+    start = start_date.strftime("%Y-%m-%d")
+    end = (end_date or datetime.now(UTC)).strftime("%Y-%m-%d")
+    synced = (datetime.now(UTC) - timedelta(seconds=GITHUB_CACHE_SKEW)).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+
+    # List of (start, end, updated since) searches.
+    searches = [(start, end, None)]
+    coverage = github_cache.get_coverage(repo)
+    if coverage and coverage["start"] <= end and coverage["end"] >= start:
+        cached_start = max(start, coverage["start"])
+        cached_end = min(end, coverage["end"])
+        searches = [(cached_start, cached_end, coverage["synced"])]
+        if start < cached_start:
+            searches.append((start, shift(cached_start, -1), None))
+        if cached_end < end:
+            searches.append((shift(cached_end, 1), end, None))
+
+    fetched = 0
+    for search_start, search_end, updated in searches:
+        search_query = query.replace("%REPO%", repo).replace(
+            "%UPDATED%", f" updated:>={updated}" if updated else ""
+        )
+        fetched += github_cache.save_prs(
+            repo,
+            github_complete_reviews(
+                repo, github_search_range(search_query, search_start, search_end)
+            ),
+        )
+    # The coverage is only updated once all searches completed.
+    github_cache.set_coverage(repo, start, end, synced)
+
+    count = 0
+    for node in github_cache.get_prs(repo, start, end):
+        count += 1
+        yield node
+    print(f"  {repo}: {fetched} PRs fetched, {count - fetched} from cache")
+
+
+def merge_pr_stats(pr_stats, repo_stats):
+    """Merge stats from query_pr_data() for one repository into pr_stats."""
+    for author, repos in repo_stats["review_times"].items():
+        for repo, times in repos.items():
+            pr_stats["review_times"][author].setdefault(repo, []).extend(times)
+    for author, pr_numbers in repo_stats["pr_authored"].items():
+        if author in pr_stats["pr_authored"]:
+            pr_stats["pr_authored"][author].update(pr_numbers)
+        else:
+            pr_stats["pr_authored"][author] = set(pr_numbers)
+    for repo, times in repo_stats["pr_closed"].items():
+        pr_stats["pr_closed"].setdefault(repo, []).extend(times)
+
+
+def query_pr_data(start_date, end_date, repo, usernames, query, pr_stats, single_repo):
+    # Include older PRs, to catch reviews that happened within the period.
+    query_start = start_date - timedelta(weeks=6)
+    for node in get_cached_prs(repo, query, query_start, end_date):
         pr_author = (node.get("author") or {}).get("login", "")
         pr_date = datetime.strptime(node["createdAt"], "%Y-%m-%dT%H:%M:%SZ")
         pr_number = node.get("number", None)
@@ -640,16 +2032,11 @@ def query_pr_data(start_date, repo, usernames, query, pr_stats, single_repo, cur
             else:
                 pr_stats["pr_closed"][repo] = [close_time.total_seconds()]
 
-    if r_data["pageInfo"]["hasNextPage"]:
-        new_cursor = r_data["pageInfo"]["endCursor"]
-        # print(f"  Requesting new page (from {new_cursor})")
-        query_pr_data(
-            start_date, repo, usernames, query, pr_stats, single_repo, new_cursor
-        )
 
+def get_gsheet_object(sheet_name, config=None):
+    import gspread
 
-def get_gsheet_object(sheet_name):
-    config = read_config("gdocs")
+    config = (config or load_config()).gdocs
     credentials = {
         "type": "service_account",
         "project_id": config["gspread_project_id"],
@@ -0,0 +1,145 @@
+import json
+import sqlite3
+import threading
+
+from pathlib import Path
+
+
+CACHE_FILE = Path(__file__).resolve().parent / "github_cache.sqlite"
+SCHEMA_VERSION = 2
+
+_connection = None
+# The connection is shared between threads fetching repositories.
+_lock = threading.RLock()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the cache database once per process."""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(CACHE_FILE, check_same_thread=False)
+        with _connection:
+            version = _connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                _connection.execute("DROP TABLE IF EXISTS prs")
+                _connection.execute("DROP TABLE IF EXISTS coverage")
+                _connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            _connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS prs (
+                    repo TEXT NOT NULL,
+                    number INTEGER NOT NULL,
+                    created TEXT NOT NULL,
+                    node TEXT NOT NULL,
+                    PRIMARY KEY (repo, number)
+                )
+                """
+            )
+            _connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS coverage (
+                    repo TEXT PRIMARY KEY,
+                    start TEXT NOT NULL,
+                    end TEXT NOT NULL,
+                    synced TEXT NOT NULL
+                )
+                """
+            )
+    return _connection
+
+
+def get_coverage(repo: str):
+    """Return the creation dates range (YYYY-MM-DD, inclusive) of cached PRs.
+
+    Returns {"start", "end", "synced"} or None. All PRs created in the range
+    are cached, as they were at the "synced" time (ISO 8601, UTC).
+    """
+    with _lock:
+        row = (
+            _connect()
+            .execute("SELECT start, end, synced FROM coverage WHERE repo = ?", (repo,))
+            .fetchone()
+        )
+    if row is None:
+        return None
+    return {"start": row[0], "end": row[1], "synced": row[2]}
+
+
+def get_prs(repo: str, start: str, end: str, batch_size: int = 100):
+    """Yield cached PR nodes created between start and end (inclusive).
+
+    Nodes are read batch_size at a time, ordered by number.
+    """
+    number = -1
+    while True:
+        with _lock:
+            rows = (
+                _connect()
+                .execute(
+                    """
+                    SELECT number, node FROM prs
+                    WHERE repo = ? AND created BETWEEN ? AND ? AND number > ?
+                    ORDER BY number
+                    LIMIT ?
+                    """,
+                    (repo, start, end, number, batch_size),
+                )
+                .fetchall()
+            )
+        for number, node in rows:
+            yield json.loads(node)
+        if len(rows) < batch_size:
+            break
+
+
+def save_prs(repo: str, nodes, batch_size: int = 100) -> int:
+    """Save PR nodes from an iterable, batch_size at a time.
+
+    Returns the number of saved nodes.
+    """
+
+    def save(batch):
+        with _lock:
+            connection = _connect()
+            with connection:
+                connection.executemany(
+                    """
+                    INSERT OR REPLACE INTO prs (repo, number, created, node)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    [
+                        (repo, node["number"], node["createdAt"][:10], json.dumps(node))
+                        for node in batch
+                    ],
+                )
+
+    count = 0
+    batch = []
+    for node in nodes:
+        batch.append(node)
+        if len(batch) == batch_size:
+            save(batch)
+            count += len(batch)
+            batch = []
+    save(batch)
+    return count + len(batch)
+
+
+def set_coverage(repo: str, start: str, end: str, synced: str) -> None:
+    """Set the range of cached PRs for the repository.
+
+    PRs created before the new range are dropped.
+    """
+    with _lock:
+        connection = _connect()
+        with connection:
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO coverage (repo, start, end, synced)
+                VALUES (?, ?, ?, ?)
+                """,
+                (repo, start, end, synced),
+            )
+            connection.execute(
+                "DELETE FROM prs WHERE repo = ? AND created < ?", (repo, start)
+            )
@@ -4,14 +4,88 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+from datetime import datetime
+
 from functions import (
+    GITHUB_RATE_LIMIT_FIELD,
     format_time,
-    get_github_object,
+    github_search_nodes,
     parse_arguments,
+    print_github_stats,
     store_json_data,
 )
 
 
+QUERY_TEMPLATE = """
+{
+  search(
+    first: 100
+    query: "%QUERY% sort:created-desc"
+    type: ISSUE
+    %CURSOR%
+  ) {
+    nodes {
+      ... on Issue {
+        number
+        title
+        closed
+        createdAt
+        closedAt
+        labels(first: 20) {
+          nodes {
+            name
+          }
+        }
+        assignees(first: 10) {
+          nodes {
+            login
+          }
+        }
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+  %RATE_LIMIT%
+}
+"""
+
+
+def search_issues(query):
+    """Return issues matching the search query, most recent first."""
+    query = QUERY_TEMPLATE.replace("%QUERY%", query).replace(
+        "%RATE_LIMIT%", GITHUB_RATE_LIMIT_FIELD
+    )
+    issues = []
+    for node in github_search_nodes(query):
+        node["createdAt"] = datetime.strptime(node["createdAt"], "%Y-%m-%dT%H:%M:%SZ")
+        if node["closedAt"]:
+            node["closedAt"] = datetime.strptime(node["closedAt"], "%Y-%m-%dT%H:%M:%SZ")
+        node["labels"] = [label["name"] for label in node["labels"]["nodes"]]
+        node["assignees"] = [user["login"] for user in node["assignees"]["nodes"]]
+        issues.append(node)
+
+    return issues
+
+
+def get_issues(repo, start_date, end_date):
+    """Return open issues, and issues opened or closed between start_date and
+    end_date (YYYY-MM-DD), most recent first.
+    """
+    issues = {}
+    for query in (
+        f"repo:{repo} is:issue is:open",
+        f"repo:{repo} is:issue created:{start_date}..{end_date}",
+        f"repo:{repo} is:issue closed:{start_date}..{end_date}",
+    ):
+        for issue in search_issues(query):
+            issues[issue["number"]] = issue
+
+    return sorted(issues.values(), key=lambda issue: issue["createdAt"], reverse=True)
+
+
 def main():
     args = parse_arguments(dry=True)
     str_start_date = args.start.strftime("%Y-%m-%d")
@@ -19,11 +93,16 @@ def main():
     str_end_date = end_date.strftime("%Y-%m-%d")
     repo = "mozilla/pontoon"
 
-    g = get_github_object()
     record = {}
 
     print(f"Analysis of repository: {repo}\n")
 
+    # All counters are computed from the same set of issues.
+    issues = get_issues(repo, str_start_date, str_end_date)
+
+    def in_range(dt):
+        return str_start_date <= dt.strftime("%Y-%m-%d") <= str_end_date
+
     # Analyze all open issues.
     stats = {
         "Total": 0,
@@ -36,114 +115,92 @@ def main():
         "Regressions": 0,
     }
 
-    open = g.search_issues(
-        query=f"repo:{repo} is:issue is:open",
-        sort="created",
-        order="desc",
-    )
+    open = [issue for issue in issues if not issue["closed"]]
     untriaged = []
     assigned = []
     regressions = []
-    if open:
-        for issue in open:
-            stats["Total"] += 1
-            triaged = False
-            for label in issue.labels:
-                if label.name == "regression":
-                    stats["Regressions"] += 1
-                    regressions.append(f"  - #{issue.number} {issue.title}")
-                elif label.name in stats.keys():
-                    stats[label.name] += 1
-                    triaged = True
-                    if issue.assignees:
-                        assignees = ", ".join(f"@{a.login}" for a in issue.assignees)
-                        assigned.append(
-                            f"  - {label.name} #{issue.number} {issue.title} ({assignees})"
-                        )
-            if not triaged:
-                stats["Untriaged"] += 1
-                untriaged.append(f"  - #{issue.number} {issue.title}")
-
-        print("Overall statistics about open issues:")
-        for k, v in stats.items():
-            print(f"- {k}: {v}")
-            record[k] = v
-        if assigned:
-            assigned.sort()
-            print(f"\nIssues with an assignee ({len(assigned)}):")
-            print("\n".join(assigned))
-        if untriaged:
-            print(f"\nUntriaged issues ({len(untriaged)}):")
-            print("\n".join(untriaged))
-        if regressions:
-            print(f"\nRegressions ({len(regressions)}):")
-            print("\n".join(regressions))
+    for issue in open:
+        stats["Total"] += 1
+        triaged = False
+        for label in issue["labels"]:
+            if label == "regression":
+                stats["Regressions"] += 1
+                regressions.append(f"  - #{issue['number']} {issue['title']}")
+            elif label in stats.keys():
+                stats[label] += 1
+                triaged = True
+                if issue["assignees"]:
+                    assignees = ", ".join(f"@{a}" for a in issue["assignees"])
+                    assigned.append(
+                        f"  - {label} #{issue['number']} {issue['title']} ({assignees})"
+                    )
+        if not triaged:
+            stats["Untriaged"] += 1
+            untriaged.append(f"  - #{issue['number']} {issue['title']}")
+
+    print("Overall statistics about open issues:")
+    for k, v in stats.items():
+        print(f"- {k}: {v}")
+        record[k] = v
+    if assigned:
+        assigned.sort()
+        print(f"\nIssues with an assignee ({len(assigned)}):")
+        print("\n".join(assigned))
+    if untriaged:
+        print(f"\nUntriaged issues ({len(untriaged)}):")
+        print("\n".join(untriaged))
+    if regressions:
+        print(f"\nRegressions ({len(regressions)}):")
+        print("\n".join(regressions))
 
     # Analyze issues opened within the requested range.
-    opened = g.search_issues(
-        query=f"repo:{repo} is:issue created:{str_start_date}..{str_end_date}",
-        sort="created",
-        order="desc",
-    )
-    if opened:
-        issues = {}
-        for issue in opened:
-            created_at = issue.created_at.strftime("%Y-%m-%d")
-            labels = [
-                label.name for label in issue.labels if label.name.startswith("P")
-            ]
-            label = labels[0] if len(labels) > 0 else "-"
-            issues[f"#{issue.number}"] = (
-                f"  - #{issue.number} {created_at}: ({label}) {issue.title}"
-            )
-        issue_ids = list(issues.keys())
-        print(
-            f"Issues opened between {str_start_date} and {str_end_date} ({len(issue_ids)}): {', '.join(issue_ids)}"
+    opened = [issue for issue in issues if in_range(issue["createdAt"])]
+    opened_issues = {}
+    for issue in opened:
+        created_at = issue["createdAt"].strftime("%Y-%m-%d")
+        labels = [label for label in issue["labels"] if label.startswith("P")]
+        label = labels[0] if len(labels) > 0 else "-"
+        opened_issues[f"#{issue['number']}"] = (
+            f"  - #{issue['number']} {created_at}: ({label}) {issue['title']}"
         )
-        record["opened"] = len(issue_ids)
-        if args.verbose:
-            print("\n".join(issues.values()))
+    issue_ids = list(opened_issues.keys())
+    print(
+        f"Issues opened between {str_start_date} and {str_end_date} ({len(issue_ids)}): {', '.join(issue_ids)}"
+    )
+    record["opened"] = len(issue_ids)
+    if args.verbose:
+        print("\n".join(opened_issues.values()))
 
     # Analyze issues closed within the requested range.
-    closed = g.search_issues(
-        query=f"repo:{repo} is:issue closed:{str_start_date}..{str_end_date}",
-        sort="created",
-        order="desc",
-    )
-    if closed:
-        issues = {}
-        age = 0
-        for issue in closed:
-            closed_at = issue.closed_at.strftime("%Y-%m-%d")
-            age += (issue.closed_at - issue.created_at).total_seconds()
-            labels = [
-                label.name for label in issue.labels if label.name.startswith("P")
-            ]
-            label = labels[0] if len(labels) > 0 else "-"
-            issues[f"#{issue.number}"] = (
-                f"  - #{issue.number} {closed_at}: ({label}) {issue.title}"
-            )
-        issue_ids = list(issues.keys())
-        count = len(issue_ids)
-        avg_age = round(age / count) if count > 0 else 0
-        print(
-            f"Issues closed between {str_start_date} and {str_end_date} ({count}): {', '.join(issue_ids)}"
+    closed = [
+        issue for issue in issues if issue["closed"] and in_range(issue["closedAt"])
+    ]
+    closed_issues = {}
+    age = 0
+    for issue in closed:
+        closed_at = issue["closedAt"].strftime("%Y-%m-%d")
+        age += (issue["closedAt"] - issue["createdAt"]).total_seconds()
+        labels = [label for label in issue["labels"] if label.startswith("P")]
+        label = labels[0] if len(labels) > 0 else "-"
+        closed_issues[f"#{issue['number']}"] = (
+            f"  - #{issue['number']} {closed_at}: ({label}) {issue['title']}"
         )
-        record["closed"] = count
-        # Store value in hours.
-        record["avg-time-to-close"] = round(avg_age / 3600, 1)
-        if avg_age > 0:
-            print(f"Average age of closed issues: {format_time(avg_age)}")
-        if args.verbose:
-            print("\n".join(issues.values()))
+    issue_ids = list(closed_issues.keys())
+    count = len(issue_ids)
+    avg_age = round(age / count) if count > 0 else 0
+    print(
+        f"Issues closed between {str_start_date} and {str_end_date} ({count}): {', '.join(issue_ids)}"
+    )
+    record["closed"] = count
+    # Store value in hours.
+    record["avg-time-to-close"] = round(avg_age / 3600, 1)
+    if avg_age > 0:
+        print(f"Average age of closed issues: {format_time(avg_age)}")
+    if args.verbose:
+        print("\n".join(closed_issues.values()))
 
     # Analyze regression issues filed during the requested range.
-    new_regressions = g.search_issues(
-        query=f"repo:{repo} is:issue label:regression created:{str_start_date}..{str_end_date}",
-        sort="created",
-        order="desc",
-    )
-    regression_issues = list(new_regressions)
+    regression_issues = [issue for issue in opened if "regression" in issue["labels"]]
     count = len(regression_issues)
     print(
         f"Regression issues filed between {str_start_date} and {str_end_date} ({count})"
@@ -151,12 +208,14 @@ def main():
     record["new-regressions"] = count
     if args.verbose and regression_issues:
         for issue in regression_issues:
-            created_at = issue.created_at.strftime("%Y-%m-%d")
-            print(f"  - #{issue.number} {created_at}: {issue.title}")
+            created_at = issue["createdAt"].strftime("%Y-%m-%d")
+            print(f"  - #{issue['number']} {created_at}: {issue['title']}")
 
     if not args.dry:
         store_json_data("pontoon-issues", record, day=end_date)
 
+    print_github_stats()
+
 
 if __name__ == "__main__":
     main()
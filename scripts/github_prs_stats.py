@@ -7,13 +7,66 @@
 from datetime import datetime, timezone
 
 from functions import (
+    GITHUB_RATE_LIMIT_FIELD,
     format_time,
-    get_github_object,
+    github_search_range,
     parse_arguments,
+    print_github_stats,
     store_json_data,
 )
 
 
+GITHUB_FIRST_DAY = "2008-01-01"
+
+QUERY_TEMPLATE = """
+{
+  search(
+    first: 100
+    query: "repo:%REPO% is:pr %FILTER% sort:created-desc"
+    type: ISSUE
+    %CURSOR%
+  ) {
+    issueCount
+    nodes {
+      ... on PullRequest {
+        number
+        createdAt
+        closedAt
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+  %RATE_LIMIT%
+}
+"""
+
+
+def search_prs(repo, search_filter, start_date, end_date):
+    """Return PRs matching the search filter, most recent first.
+
+    search_filter must include %START% and %END% placeholders, and the search
+    is split to get more than 1,000 PRs.
+    """
+    query = (
+        QUERY_TEMPLATE.replace("%REPO%", repo)
+        .replace("%FILTER%", search_filter)
+        .replace("%RATE_LIMIT%", GITHUB_RATE_LIMIT_FIELD)
+    )
+    nodes = github_search_range(query, start_date, end_date)
+
+    prs = []
+    for node in nodes:
+        node["createdAt"] = datetime.fromisoformat(node["createdAt"])
+        if node["closedAt"]:
+            node["closedAt"] = datetime.fromisoformat(node["closedAt"])
+        prs.append(node)
+
+    return sorted(prs, key=lambda pr: pr["createdAt"], reverse=True)
+
+
 def main():
     args = parse_arguments(repo=True)
     str_start_date = args.start.strftime("%Y-%m-%d")
@@ -21,96 +74,91 @@ def main():
     str_end_date = end_date.strftime("%Y-%m-%d")
     repo = args.repo
 
-    g = get_github_object()
     record = {}
 
     # Opened pull requests.
-    opened = g.search_issues(
-        query=f"repo:{repo} is:pr created:{str_start_date}..{str_end_date}",
-        sort="created",
-        order="desc",
-    )
+    opened = search_prs(repo, "created:%START%..%END%", str_start_date, str_end_date)
 
-    if opened:
-        prs = []
-        for pr in opened:
-            created_at = pr.created_at.strftime("%Y-%m-%d")
-            prs.append(f"#{pr.number} ({created_at})")
+    prs = []
+    for pr in opened:
+        created_at = pr["createdAt"].strftime("%Y-%m-%d")
+        prs.append(f"#{pr['number']} ({created_at})")
 
-            if args.verbose:
-                print(f"Number: #{pr.number}")
-                print(f"Created: {created_at}")
+        if args.verbose:
+            print(f"Number: #{pr['number']}")
+            print(f"Created: {created_at}")
 
-        count = len(prs)
-        print(
-            f"Opened PRs between {str_start_date} and {str_end_date} ({count}): {', '.join(prs)}"
-        )
-        record["opened"] = count
+    count = len(prs)
+    print(
+        f"Opened PRs between {str_start_date} and {str_end_date} ({count}): {', '.join(prs)}"
+    )
+    record["opened"] = count
 
     # Closed pull requests.
-    closed = g.search_issues(
-        query=f"repo:{repo} is:pr is:closed closed:{str_start_date}..{str_end_date}",
-        sort="created",
-        order="desc",
+    closed = search_prs(
+        repo, "is:closed closed:%START%..%END%", str_start_date, str_end_date
     )
 
-    if closed:
-        overall_time = 0
-        prs = []
-        for pr in closed:
-            closed_at = pr.closed_at.strftime("%Y-%m-%d")
-            time_to_close = (pr.closed_at - pr.created_at).total_seconds()
-            overall_time += time_to_close
-            prs.append(f"#{pr.number} ({closed_at})")
-
-            if args.verbose:
-                print(f"Number: #{pr.number}")
-                print(f"Created: {pr.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-                print(f"Closed: {closed_at}")
-                print(f"Time to close: {format_time(time_to_close)}")
-
-        count = len(prs)
-        avg_time = round(overall_time / count) if count > 0 else 0
-        print(
-            f"Closed PRs between {str_start_date} and {str_end_date} ({count}): {', '.join(prs)}"
-        )
-        record["closed"] = count
-        # Store value in hours.
-        record["avg-time-to-close"] = round(avg_time / 3600, 1)
-        if avg_time > 0:
-            print(f"Average time to close: {format_time(avg_time)}")
+    overall_time = 0
+    prs = []
+    for pr in closed:
+        closed_at = pr["closedAt"].strftime("%Y-%m-%d")
+        time_to_close = (pr["closedAt"] - pr["createdAt"]).total_seconds()
+        overall_time += time_to_close
+        prs.append(f"#{pr['number']} ({closed_at})")
+
+        if args.verbose:
+            print(f"Number: #{pr['number']}")
+            print(f"Created: {pr['createdAt'].strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"Closed: {closed_at}")
+            print(f"Time to close: {format_time(time_to_close)}")
+
+    count = len(prs)
+    avg_time = round(overall_time / count) if count > 0 else 0
+    print(
+        f"Closed PRs between {str_start_date} and {str_end_date} ({count}): {', '.join(prs)}"
+    )
+    record["closed"] = count
+    # Store value in hours.
+    record["avg-time-to-close"] = round(avg_time / 3600, 1)
+    if avg_time > 0:
+        print(f"Average time to close: {format_time(avg_time)}")
 
     # Pull requests currently open.
-    open = g.search_issues(
-        query=f"repo:{repo} is:pr is:open",
-        sort="created",
-        order="desc",
+    # Search from the start of GitHub, so that the range can be split if there
+    # are more than 1,000 open PRs.
+    today = datetime.now(timezone.utc)
+    open = search_prs(
+        repo,
+        "is:open created:%START%..%END%",
+        GITHUB_FIRST_DAY,
+        today.strftime("%Y-%m-%d"),
     )
 
-    if open:
-        prs = []
-        age = 0
-        today = datetime.now(timezone.utc)
-        for pr in open:
-            created_at = pr.created_at.strftime("%Y-%m-%d")
-            prs.append(f"#{pr.number} ({created_at})")
-            pr_age = (today - pr.created_at).total_seconds()
-            age += pr_age
-            if args.verbose:
-                print(f"Number: #{pr.number}")
-                print(f"Created: {created_at}")
-                print(f"Age: {format_time(pr_age)}")
-        count = len(prs)
-        avg_age = round(age / count) if count > 0 else 0
-        record["open"] = count
-        # Store value in hours.
-        record["avg-age-open"] = round(avg_age / 3600, 1)
-        print(f"Open PRs as of {today.strftime('%Y-%m-%d')}: {count}")
-        if avg_age > 0:
-            print(f"Average age: {format_time(avg_age)}")
+    prs = []
+    age = 0
+    for pr in open:
+        created_at = pr["createdAt"].strftime("%Y-%m-%d")
+        prs.append(f"#{pr['number']} ({created_at})")
+        pr_age = (today - pr["createdAt"]).total_seconds()
+        age += pr_age
+        if args.verbose:
+            print(f"Number: #{pr['number']}")
+            print(f"Created: {created_at}")
+            print(f"Age: {format_time(pr_age)}")
+    count = len(prs)
+    avg_age = round(age / count) if count > 0 else 0
+    record["open"] = count
+    # Store value in hours.
+    record["avg-age-open"] = round(avg_age / 3600, 1)
+    print(f"Open PRs as of {today.strftime('%Y-%m-%d')}: {count}")
+    if avg_age > 0:
+        print(f"Average age: {format_time(avg_age)}")
 
     store_json_data("pontoon-prs", record, day=end_date)
 
+    print_github_stats()
+
 
 if __name__ == "__main__":
     main()
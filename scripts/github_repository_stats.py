@@ -5,7 +5,13 @@ import calendar
 from collections import defaultdict
 from datetime import datetime
 
-from functions import format_time, get_gh_usernames, get_pr_details, parse_arguments
+from functions import (
+    format_time,
+    get_gh_usernames,
+    get_pr_details,
+    parse_arguments,
+    print_github_stats,
+)
 
 
 def main():
@@ -99,6 +105,8 @@ def main():
     if overall_stats["total_authored"] > 0:
         print(f"Total authored: {overall_stats['total_authored']}")
 
+    print_github_stats()
+
 
 if __name__ == "__main__":
     main()
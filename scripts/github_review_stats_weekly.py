@@ -4,6 +4,8 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import sys
+
 from collections import defaultdict
 
 from functions import (
@@ -12,6 +14,7 @@ from functions import (
     get_pr_details,
     get_user_pr_collection,
     parse_arguments,
+    print_github_stats,
     store_json_data,
 )
 
@@ -29,7 +32,10 @@ def main():
         "repositories": set(),
     }
 
-    get_user_pr_collection(period_data, start_date)
+    missing, failed = get_user_pr_collection(period_data, start_date)
+    if failed:
+        # Requests failed after retries, totals would be undercounted.
+        sys.exit(f"Couldn't retrieve data for: {', '.join(failed)}")
 
     # Extract data on avg time to review
     pr_stats = defaultdict(lambda: defaultdict(dict))
@@ -49,6 +55,9 @@ def main():
 
     print("\n-----------\n")
     for username, name in usernames.items():
+        if username in missing:
+            print(f"\nUser: {name} (no data available for {username})")
+            continue
         repos = pr_stats["review_times"][username]
         details = []
         total_reviews = period_data["pr_reviewed"][username]["total"]
@@ -96,9 +105,13 @@ def main():
         print(f"Average review time: {format_time(avg)}")
     print(f"\nNumber of pull requests created: {total_created}")
     print(f"\nNumber of repositories: {len(period_data['repositories'])}")
+    if missing:
+        print(f"\nUsers not included in totals: {', '.join(missing)}")
 
     store_json_data("epm-reviews", record, extend=True, day=end_date)
 
+    print_github_stats()
+
 
 if __name__ == "__main__":
     main()
@@ -2,7 +2,14 @@
 
 from datetime import datetime
 
-from functions import format_time, github_api_request, parse_arguments
+from functions import (
+    GITHUB_RATE_LIMIT_FIELD,
+    format_time,
+    github_complete_reviews,
+    github_search_range,
+    parse_arguments,
+    print_github_stats,
+)
 
 
 QUERY_TEMPLATE = """
@@ -13,6 +20,7 @@ QUERY_TEMPLATE = """
     type: ISSUE
     %CURSOR%
   ) {
+    issueCount
     nodes {
       ... on PullRequest {
         number
@@ -22,7 +30,7 @@ QUERY_TEMPLATE = """
           login
         }
         createdAt
-        reviews(first: 100) {
+        reviews(first: 20) {
           nodes {
             author {
               login
@@ -30,6 +38,10 @@ QUERY_TEMPLATE = """
             submittedAt
             state
           }
+          pageInfo {
+            hasNextPage
+            endCursor
+          }
         }
       }
     }
@@ -38,6 +50,7 @@ QUERY_TEMPLATE = """
       endCursor
     }
   }
+  %RATE_LIMIT%
 }
 """
 
@@ -45,52 +58,43 @@ QUERY_TEMPLATE = """
 def fetch_prs(repo, start_date, end_date, verbose=False):
     query = QUERY_TEMPLATE
     query = query.replace("%REPO%", repo)
-    query = query.replace("%START%", start_date.strftime("%Y-%m-%d"))
-    query = query.replace("%END%", end_date.strftime("%Y-%m-%d"))
+    query = query.replace("%RATE_LIMIT%", GITHUB_RATE_LIMIT_FIELD)
 
     times = []
     prs_without_review = []
 
-    def fetch_page(cursor=""):
-        page_query = query.replace("%CURSOR%", f'after: "{cursor}"' if cursor else "")
-        r = github_api_request(page_query)
-        data = r.json()["data"]["search"]
-
-        for node in data["nodes"]:
-            pr_number = node["number"]
-            pr_url = node.get("url", "")
-            pr_author = (node.get("author") or {}).get("login", "")
-            pr_created = datetime.strptime(node["createdAt"], "%Y-%m-%dT%H:%M:%SZ")
-
-            # Find the earliest qualifying review (approved or changes requested)
-            # by someone other than the PR author.
-            first_review_time = None
-            for review in node["reviews"]["nodes"]:
-                if review["state"] not in ("APPROVED", "CHANGES_REQUESTED"):
-                    continue
-                reviewer = (review.get("author") or {}).get("login", "")
-                if reviewer == pr_author:
-                    continue
-                review_dt = datetime.strptime(
-                    review["submittedAt"], "%Y-%m-%dT%H:%M:%SZ"
+    nodes = github_search_range(
+        query, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    )
+    for node in github_complete_reviews(repo, nodes):
+        pr_number = node["number"]
+        pr_url = node.get("url", "")
+        pr_author = (node.get("author") or {}).get("login", "")
+        pr_created = datetime.strptime(node["createdAt"], "%Y-%m-%dT%H:%M:%SZ")
+
+        # Find the earliest qualifying review (approved or changes requested)
+        # by someone other than the PR author.
+        first_review_time = None
+        for review in node["reviews"]["nodes"]:
+            if review["state"] not in ("APPROVED", "CHANGES_REQUESTED"):
+                continue
+            reviewer = (review.get("author") or {}).get("login", "")
+            if reviewer == pr_author:
+                continue
+            review_dt = datetime.strptime(review["submittedAt"], "%Y-%m-%dT%H:%M:%SZ")
+            if first_review_time is None or review_dt < first_review_time:
+                first_review_time = review_dt
+
+        if first_review_time is not None:
+            elapsed = (first_review_time - pr_created).total_seconds()
+            times.append(elapsed)
+            if verbose:
+                print(
+                    f"  PR #{pr_number} ({pr_author}): {format_time(int(elapsed))} — {pr_url}"
                 )
-                if first_review_time is None or review_dt < first_review_time:
-                    first_review_time = review_dt
-
-            if first_review_time is not None:
-                elapsed = (first_review_time - pr_created).total_seconds()
-                times.append(elapsed)
-                if verbose:
-                    print(
-                        f"  PR #{pr_number} ({pr_author}): {format_time(int(elapsed))} — {pr_url}"
-                    )
-            else:
-                prs_without_review.append((pr_number, pr_author, pr_url))
-
-        if data["pageInfo"]["hasNextPage"]:
-            fetch_page(data["pageInfo"]["endCursor"])
-
-    fetch_page()
+        else:
+            prs_without_review.append((pr_number, pr_author, pr_url))
+
     return times, prs_without_review
 
 
@@ -125,6 +129,8 @@ def main():
             for pr_number, pr_author, pr_url in prs_without_review:
                 print(f"  PR #{pr_number} ({pr_author}): {pr_url}")
 
+    print_github_stats()
+
 
 if __name__ == "__main__":
     main()
@@ -1,75 +1,165 @@
 import json
+import sqlite3
+import threading
 import time
 
 from pathlib import Path
 
 
-CACHE_FILE = Path(__file__).resolve().parent / "phab_cache.json"
-
-
-def _is_fresh(path: Path) -> bool:
-    try:
-        return (time.time() - path.stat().st_mtime) <= (2 * 60 * 60)
-    except FileNotFoundError:
-        return False
+CACHE_FILE = Path(__file__).resolve().parent / "phab_cache.sqlite"
+SCHEMA_VERSION = 2
+
+# Time to live (in seconds) for each type of entry. Transactions of closed
+# (published or abandoned) revisions never change, so they're kept until
+# evicted. Expired transactions of open revisions are also kept, so that only
+# newer transactions need to be fetched when revalidating them.
+OPEN_REVISION_TTL = 2 * 60 * 60
+GROUP_TTL = 24 * 60 * 60
+USER_PHIDS_TTL = 7 * 24 * 60 * 60
+
+# Maximum number of entries to keep. Least recently used entries are evicted
+# first once the limit is reached.
+MAX_ENTRIES = 5000
+
+# Minimum interval (in seconds) between updates of an entry's access time, to
+# avoid a write for every cache hit.
+ACCESS_RESOLUTION = 60 * 60
+
+_connection = None
+# The connection is shared between threads prefetching transactions.
+_lock = threading.RLock()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the cache database once per process, dropping expired entries.
+
+    Expired transactions are kept, see get_stale_transactions().
+    """
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(CACHE_FILE, check_same_thread=False)
+        # Avoid a sync to disk for every write, the cache can be rebuilt.
+        _connection.execute("PRAGMA journal_mode = WAL")
+        _connection.execute("PRAGMA synchronous = NORMAL")
+        with _connection:
+            version = _connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                _connection.execute("DROP TABLE IF EXISTS cache")
+                _connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            _connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires REAL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            _connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)"
+            )
+            removed = _connection.execute(
+                """
+                DELETE FROM cache
+                WHERE expires IS NOT NULL AND expires < ? AND key NOT LIKE 'txn:%'
+                """,
+                (time.time(),),
+            ).rowcount
+        if removed:
+            print(f"Removed {removed} expired cache entries...")
+    return _connection
+
+
+def _get(key: str, include_expired=False):
+    with _lock:
+        connection = _connect()
+        now = time.time()
+        row = connection.execute(
+            "SELECT value, expires, accessed FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if not include_expired and row[1] is not None and row[1] < now:
+            return None
+        try:
+            value = json.loads(row[0])
+        except ValueError:
+            return None
+        if row[2] < now - ACCESS_RESOLUTION:
+            with connection:
+                connection.execute(
+                    "UPDATE cache SET accessed = ? WHERE key = ?", (now, key)
+                )
+        return value
+
+
+def _set(key: str, value, ttl=None) -> None:
+    """Store a value, expiring after ttl seconds (never if ttl is None)."""
+    value = json.dumps(value, ensure_ascii=False)
+    with _lock:
+        connection = _connect()
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with connection:
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO cache (key, value, expires, accessed)
+                VALUES (?, ?, ?, ?)
+                """,
+                (key, value, expires, now),
+            )
+            connection.execute(
+                """
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (MAX_ENTRIES,),
+            )
 
 
-def _load() -> dict:
-    if not _is_fresh(CACHE_FILE):
-        try:
-            print("Cache is stale, removing...")
-            CACHE_FILE.unlink(missing_ok=True)
-        except Exception:
-            pass
-        return {}
-    try:
-        with CACHE_FILE.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+def get_transactions(diff_identifier: str):
+    """Return cached transactions for a given diff/revision id, or None."""
+    return _get(f"txn:{diff_identifier}")
 
 
-def _save(cache: dict) -> None:
-    tmp = CACHE_FILE.with_suffix(CACHE_FILE.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False)
-    tmp.replace(CACHE_FILE)
+def get_stale_transactions(diff_identifier: str):
+    """Return cached transactions for a given diff/revision id, even if expired.
 
+    Used to only fetch transactions newer than the cached ones.
+    """
+    return _get(f"txn:{diff_identifier}", include_expired=True)
 
-def get_transactions(diff_identifier: str):
-    """Return cached transactions for a given diff/revision id, or None."""
-    cache = _load()
-    return cache.get(f"txn:{diff_identifier}")
 
+def set_transactions(diff_identifier: str, transactions, closed=False) -> None:
+    """Save transactions for a given diff/revision id.
 
-def set_transactions(diff_identifier: str, transactions) -> None:
-    """Save transactions for a given diff/revision id."""
-    cache = _load()
-    cache[f"txn:{diff_identifier}"] = transactions
-    _save(cache)
+    Transactions of closed revisions are kept indefinitely, while open
+    revisions are revalidated after OPEN_REVISION_TTL.
+    """
+    _set(
+        f"txn:{diff_identifier}",
+        transactions,
+        ttl=None if closed else OPEN_REVISION_TTL,
+    )
 
 
 def get_group(group_name: str):
     """Return cached group info (phid + filtered members) or None."""
-    cache = _load()
-    return cache.get(f"group:{group_name}")
+    return _get(f"group:{group_name}")
 
 
 def set_group(group_name: str, group_data: dict) -> None:
     """Save group info (phid + filtered members)."""
-    cache = _load()
-    cache[f"group:{group_name}"] = group_data
-    _save(cache)
+    _set(f"group:{group_name}", group_data, ttl=GROUP_TTL)
 
 
 def get_user_phids():
     """Return cached list of user phid dicts, or None."""
-    cache = _load()
-    return cache.get("user_phids")
+    return _get("user_phids")
 
 
 def set_user_phids(users: list) -> None:
     """Save list of user phid dicts."""
-    cache = _load()
-    cache["user_phids"] = users
-    _save(cache)
+    _set("user_phids", users, ttl=USER_PHIDS_TTL)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+This script retrieves differential revisions authored or reviewed by l10n users
+and review groups in Phabricator, and stores both the epm-reviews (per user)
+and phab-groups (per review group) records.
+
+Revisions and their transactions are fetched once and shared between the two
+reports.
+"""
+
+import phabricator_group_activity as group_activity
+import phabricator_user_activity as user_activity
+
+from functions import (
+    get_known_phab_group_diffs,
+    get_known_phab_user_diffs,
+    get_phab_review_group_names,
+    get_phab_review_groups,
+    parse_arguments,
+    phab_prefetch_transactions,
+    phab_search_revisions_by,
+    print_conduit_stats,
+    store_json_data,
+)
+
+
+def main():
+    args = parse_arguments(phab=True)
+    # Convert start/end dates to a Unix timestamp.
+    start_timestamp = int(args.start.timestamp())
+    end_date = args.end
+    end_timestamp = int(end_date.timestamp())
+
+    print(
+        f"Revisions between {args.start.strftime('%Y-%m-%d')} and {args.end.strftime('%Y-%m-%d')}"
+    )
+    users = user_activity.get_user_phids()
+    review_groups = get_phab_review_groups(get_phab_review_group_names())
+    known_user_diffs = get_known_phab_user_diffs()
+    known_group_diffs = get_known_phab_group_diffs()
+
+    # Search revisions for all users and groups at once.
+    user_phids = [user["phid"] for user in users]
+    group_phids = [info["phid"] for info in review_groups.values()]
+    print("Getting revisions authored by users within the date range...")
+    authored_revisions = phab_search_revisions_by(
+        "authorPHIDs", user_phids, start_timestamp, end_timestamp, args.check_search
+    )
+    print("Getting revisions reviewed by users or groups within the date range...")
+    reviewed_revisions = phab_search_revisions_by(
+        "reviewerPHIDs",
+        user_phids + group_phids,
+        start_timestamp,
+        end_timestamp,
+        args.check_search,
+    )
+    user_revisions = {
+        "authored": authored_revisions,
+        "reviewed": {phid: reviewed_revisions[phid] for phid in user_phids},
+    }
+    group_revisions = {
+        group: reviewed_revisions[info["phid"]] for group, info in review_groups.items()
+    }
+
+    # Fetch transactions needed by either report once, concurrently.
+    pending_revisions = {}
+    for revisions in user_revisions["reviewed"].values():
+        for revision in user_activity.get_pending_revisions(
+            "reviewed", revisions, known_user_diffs
+        ):
+            pending_revisions[revision["id"]] = revision
+    for revisions in group_revisions.values():
+        for revision in group_activity.get_pending_revisions(
+            revisions, known_group_diffs
+        ):
+            pending_revisions[revision["id"]] = revision
+    revisions_transactions = phab_prefetch_transactions(
+        list(pending_revisions.values()), args.workers
+    )
+
+    user_stats = user_activity.get_user_stats(
+        users,
+        user_revisions,
+        args.start,
+        end_date,
+        known_user_diffs,
+        review_groups,
+        revisions_transactions,
+    )
+    print("\n-----------\n")
+    group_stats = group_activity.get_group_stats(
+        review_groups,
+        group_revisions,
+        start_timestamp,
+        end_timestamp,
+        known_group_diffs,
+        revisions_transactions,
+    )
+
+    store_json_data("epm-reviews", user_stats, extend=True, day=end_date)
+    store_json_data("phab-groups", group_stats, day=end_date)
+
+    print_conduit_stats()
+
+
+if __name__ == "__main__":
+    main()
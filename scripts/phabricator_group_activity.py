@@ -16,45 +16,36 @@ from datetime import datetime
 from functions import (
     format_time,
     get_known_phab_group_diffs,
+    get_phab_review_group_names,
     get_phab_review_groups,
     parse_arguments,
-    phab_diff_transactions,
-    phab_search_revisions,
+    phab_prefetch_transactions,
+    phab_search_revisions_by,
+    print_conduit_stats,
     store_json_data,
 )
 
 
+def get_pending_revisions(revisions, known_diffs):
+    """Return revisions that are not fully recorded yet."""
+    return [
+        revision
+        for revision in revisions
+        if f"D{revision['id']}" not in known_diffs["first_reviewed"]
+        or f"D{revision['id']}" not in known_diffs["approved"]
+    ]
+
+
 def get_revisions_review_data(
     group_members,
     results_data,
     group_phid,
+    revisions,
     start_timestamp,
     end_timestamp,
     known_diffs,
+    revisions_transactions,
 ):
-    # Query revisions for the group.
-    print("Getting revisions created within the date range...")
-    search_constraints = {
-        "reviewerPHIDs": [group_phid],
-        "createdStart": start_timestamp,
-        "createdEnd": end_timestamp,
-    }
-    created_revisions = phab_search_revisions(search_constraints)
-
-    print("Getting revisions modified within the date range...")
-    search_constraints = {
-        "reviewerPHIDs": [group_phid],
-        "modifiedStart": start_timestamp,
-        "modifiedEnd": end_timestamp,
-    }
-    modified_revisions = phab_search_revisions(search_constraints)
-
-    # Remove duplicates.
-    unique_revisions = {d["id"]: d for d in created_revisions + modified_revisions}
-    revisions = list(unique_revisions.values())
-    if not revisions:
-        return
-
     # Sort revisions by creation date.
     revisions = sorted(revisions, key=lambda rev: rev["fields"]["dateCreated"])
     for revision in revisions:
@@ -67,7 +58,7 @@ def get_revisions_review_data(
             print(f"Skipping already fully recorded diff {revision_id}")
             continue
 
-        transactions = phab_diff_transactions(revision_id, revision["phid"])
+        transactions = revisions_transactions[revision_id]
 
         first_review_ts = None
         first_review_reviewer = None
@@ -141,26 +132,16 @@ def get_revisions_review_data(
             }
 
 
-def main():
-    args = parse_arguments(group=True)
-    # Convert start/end dates to a Unix timestamp.
-    start_timestamp = int(args.start.timestamp())
-    end_date = args.end
-    end_timestamp = int(end_date.timestamp())
-
-    if args.group:
-        groups = [args.group]
-    else:
-        # Check all relevant groups.
-        groups = ["android-l10n-reviewers", "fluent-reviewers"]
-
-    print(
-        f"Revisions between {args.start.strftime('%Y-%m-%d')} and {args.end.strftime('%Y-%m-%d')}"
-    )
-
+def get_group_stats(
+    review_groups,
+    group_revisions,
+    start_timestamp,
+    end_timestamp,
+    known_diffs,
+    revisions_transactions,
+):
+    """Return the phab-groups record for the revisions of each group."""
     stats = {}
-    known_diffs = get_known_phab_group_diffs()
-    review_groups = get_phab_review_groups(groups)
     for group, info in review_groups.items():
         group_phid = info["phid"]
         group_members = info["members"]
@@ -170,9 +151,11 @@ def main():
             group_members,
             revisions_data,
             group_phid,
+            group_revisions[group],
             start_timestamp,
             end_timestamp,
             known_diffs,
+            revisions_transactions,
         )
 
         # Aggregate per-reviewer stats.
@@ -248,8 +231,64 @@ def main():
                 f"approvals={n_approvals} (avg {avg_approve} h)"
             )
 
+    return stats
+
+
+def main():
+    args = parse_arguments(group=True, phab=True)
+    # Convert start/end dates to a Unix timestamp.
+    start_timestamp = int(args.start.timestamp())
+    end_date = args.end
+    end_timestamp = int(end_date.timestamp())
+
+    if args.group:
+        groups = [args.group]
+    else:
+        # Check all relevant groups.
+        groups = get_phab_review_group_names()
+
+    print(
+        f"Revisions between {args.start.strftime('%Y-%m-%d')} and {args.end.strftime('%Y-%m-%d')}"
+    )
+
+    known_diffs = get_known_phab_group_diffs()
+    review_groups = get_phab_review_groups(groups)
+
+    # Query revisions for all groups at once.
+    print("Getting revisions created or modified within the date range...")
+    revisions = phab_search_revisions_by(
+        "reviewerPHIDs",
+        [info["phid"] for info in review_groups.values()],
+        start_timestamp,
+        end_timestamp,
+        args.check_search,
+    )
+    group_revisions = {
+        group: revisions[info["phid"]] for group, info in review_groups.items()
+    }
+
+    # Fetch transactions for diffs not fully recorded yet concurrently.
+    pending_revisions = {
+        revision["id"]: revision
+        for group_revisions_list in group_revisions.values()
+        for revision in get_pending_revisions(group_revisions_list, known_diffs)
+    }
+    revisions_transactions = phab_prefetch_transactions(
+        list(pending_revisions.values()), args.workers
+    )
+
+    stats = get_group_stats(
+        review_groups,
+        group_revisions,
+        start_timestamp,
+        end_timestamp,
+        known_diffs,
+        revisions_transactions,
+    )
     store_json_data("phab-groups", stats, day=end_date)
 
+    print_conduit_stats()
+
 
 if __name__ == "__main__":
     main()
@@ -9,56 +9,41 @@ import statistics
 
 from functions import (
     get_known_phab_user_diffs,
+    get_phab_review_group_names,
     get_phab_review_groups,
     get_phab_usernames,
     parse_arguments,
-    phab_diff_transactions,
+    phab_prefetch_transactions,
     phab_query,
-    phab_search_revisions,
+    phab_search_user_revisions,
+    print_conduit_stats,
     store_json_data,
 )
 from phab_cache import get_user_phids as get_cached_user_phids, set_user_phids
 
 
+def get_pending_revisions(type, revisions, known_diffs):
+    """Return revisions that are not recorded yet for this type."""
+    return [
+        revision
+        for revision in revisions
+        if f"D{revision['id']}" not in known_diffs.get(type, set())
+    ]
+
+
 def get_revisions(
-    type, user, results_data, start_timestamp, end_timestamp, known_diffs, review_groups
+    type,
+    user,
+    revisions,
+    results_data,
+    start_timestamp,
+    end_timestamp,
+    known_diffs,
+    review_groups,
+    revisions_transactions,
 ):
     username = user["user"]
-    print(f"Searching revisions {type} by {username}...")
-
-    print("Getting revisions created within the date range...")
-    if type == "authored":
-        search_constraints = {
-            "authorPHIDs": [user["phid"]],
-            "createdStart": start_timestamp,
-            "createdEnd": end_timestamp,
-        }
-    else:
-        search_constraints = {
-            "reviewerPHIDs": [user["phid"]],
-            "createdStart": start_timestamp,
-            "createdEnd": end_timestamp,
-        }
-    created_revisions = phab_search_revisions(search_constraints)
-
-    print("Getting revisions modified within the date range...")
-    if type == "authored":
-        search_constraints = {
-            "authorPHIDs": [user["phid"]],
-            "modifiedStart": start_timestamp,
-            "modifiedEnd": end_timestamp,
-        }
-    else:
-        search_constraints = {
-            "reviewerPHIDs": [user["phid"]],
-            "modifiedStart": start_timestamp,
-            "modifiedEnd": end_timestamp,
-        }
-    modified_revisions = phab_search_revisions(search_constraints)
-
-    # Remove duplicates.
-    unique_revisions = {d["id"]: d for d in created_revisions + modified_revisions}
-    revisions = list(unique_revisions.values())
+    print(f"Analyzing revisions {type} by {username}...")
     if not revisions:
         return
 
@@ -86,8 +71,7 @@ def get_revisions(
                 if user["user"] in g["members"].values()
             }
             # Process transactions to find review by the user.
-            transactions = phab_diff_transactions(revision_id, revision["phid"])
-            for txn in transactions:
+            for txn in revisions_transactions[revision_id]:
                 if txn["type"] == "reviewers":
                     for op in txn["fields"].get("operations", []):
                         if (
@@ -165,41 +149,33 @@ def get_user_phids():
     return users
 
 
-def main():
-    args = parse_arguments()
-    # Convert start/end dates to a Unix timestamp.
-    start_timestamp = int(args.start.timestamp())
-    end_date = args.end
+def get_user_stats(
+    users,
+    user_revisions,
+    start_date,
+    end_date,
+    known_diffs,
+    review_groups,
+    revisions_transactions,
+):
+    """Return the epm-reviews record for the revisions of each user."""
+    start_timestamp = int(start_date.timestamp())
     end_timestamp = int(end_date.timestamp())
 
-    print(
-        f"Revisions between {args.start.strftime('%Y-%m-%d')} and {args.end.strftime('%Y-%m-%d')}"
-    )
-    users = get_user_phids()
-    known_diffs = get_known_phab_user_diffs()
-    review_groups = get_phab_review_groups(
-        ["android-l10n-reviewers", "fluent-reviewers"]
-    )
     phab_data = {}
     for user in users:
-        get_revisions(
-            "authored",
-            user,
-            phab_data,
-            start_timestamp,
-            end_timestamp,
-            known_diffs,
-            review_groups,
-        )
-        get_revisions(
-            "reviewed",
-            user,
-            phab_data,
-            start_timestamp,
-            end_timestamp,
-            known_diffs,
-            review_groups,
-        )
+        for type in ("authored", "reviewed"):
+            get_revisions(
+                type,
+                user,
+                user_revisions[type][user["phid"]],
+                phab_data,
+                start_timestamp,
+                end_timestamp,
+                known_diffs,
+                review_groups,
+                revisions_transactions,
+            )
 
     stats = {
         "phab-authored": 0,
@@ -207,8 +183,7 @@ def main():
         "phab-details": phab_data,
     }
 
-    str_start_date = args.start.strftime("%Y-%m-%d")
-    end_date = args.end
+    str_start_date = start_date.strftime("%Y-%m-%d")
     str_end_date = end_date.strftime("%Y-%m-%d")
 
     total_authored = 0
@@ -235,8 +210,54 @@ def main():
         avg_review = round(statistics.mean(all_reviews), 2)
         print(f"Average time to review: {avg_review}")
         stats["phab-avg-time-to-review"] = avg_review
+
+    return stats
+
+
+def main():
+    args = parse_arguments(phab=True)
+    # Convert start/end dates to a Unix timestamp.
+    start_timestamp = int(args.start.timestamp())
+    end_date = args.end
+    end_timestamp = int(end_date.timestamp())
+
+    print(
+        f"Revisions between {args.start.strftime('%Y-%m-%d')} and {args.end.strftime('%Y-%m-%d')}"
+    )
+    users = get_user_phids()
+    known_diffs = get_known_phab_user_diffs()
+    review_groups = get_phab_review_groups(get_phab_review_group_names())
+    # Search revisions for all users at once.
+    user_revisions = phab_search_user_revisions(
+        [user["phid"] for user in users],
+        start_timestamp,
+        end_timestamp,
+        args.check_search,
+    )
+
+    # Reviews are extracted from transactions, fetch them concurrently.
+    pending_revisions = {
+        revision["id"]: revision
+        for revisions in user_revisions["reviewed"].values()
+        for revision in get_pending_revisions("reviewed", revisions, known_diffs)
+    }
+    revisions_transactions = phab_prefetch_transactions(
+        list(pending_revisions.values()), args.workers
+    )
+
+    stats = get_user_stats(
+        users,
+        user_revisions,
+        args.start,
+        end_date,
+        known_diffs,
+        review_groups,
+        revisions_transactions,
+    )
     store_json_data("epm-reviews", stats, extend=True, day=end_date)
 
+    print_conduit_stats()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+This script runs all the weekly collectors and exports concurrently, in a pool
+of worker processes. Each stage starts once the stages it depends on are
+completed, and its output is printed when it ends, followed by a timing
+summary.
+"""
+
+import argparse
+import importlib
+import io
+import multiprocessing
+import sys
+import time
+import traceback
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+
+from functions import close_json_data, reset_api_clients, ymd
+
+
+COLLECTORS = [
+    "github_prs_stats",
+    "github_pontoon_issues_stats",
+    "jira_l10n_stats",
+    "phabricator_activity",
+    "github_review_stats_weekly",
+    "jira_vendors_stats",
+    "jira_requests_stats",
+]
+
+# Stages, with the script run (main() is called), its description, extra
+# arguments, whether it accepts the --start argument, the stages that need to
+# complete successfully before it starts ("after"), and the stages that only
+# need to end, successfully or not ("wait").
+STAGES = {
+    "github_prs_stats": {
+        "title": "Pontoon PR stats",
+        "args": ["--repo", "mozilla/pontoon"],
+        "dates": True,
+    },
+    "github_pontoon_issues_stats": {
+        "title": "Pontoon issues stats",
+        "dates": True,
+    },
+    "jira_l10n_stats": {
+        "title": "Jira stats",
+        "dates": True,
+    },
+    "phabricator_activity": {
+        "title": "Phabricator stats",
+        "dates": True,
+    },
+    "github_review_stats_weekly": {
+        "title": "GitHub EPM review stats",
+        "dates": True,
+    },
+    "jira_vendors_stats": {
+        "title": "Jira vendor stats",
+        "dates": True,
+    },
+    "jira_requests_stats": {
+        "title": "Jira request stats",
+        "dates": True,
+    },
+    "compact_data": {
+        "title": "Compact data",
+        # Records stored by the collectors that succeeded are compacted anyway.
+        "wait": COLLECTORS,
+    },
+    "export_to_sheets": {
+        "title": "Export to Google Sheets",
+        "after": ["compact_data"] + COLLECTORS,
+    },
+    "jira_requests_data": {
+        "title": "Export Jira requests",
+    },
+    "jira_vendors_data": {
+        "title": "Export Jira vendors",
+    },
+}
+
+
+def run_stage(name, argv):
+    """Run main() from the stage's script, returning (output, error)."""
+    sys.argv = [f"{name}.py"] + argv
+    output = io.StringIO()
+    error = None
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            importlib.import_module(name).main()
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                error = str(e.code)
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            # Worker processes are reused across stages.
+            close_json_data()
+            reset_api_clients()
+
+    return output.getvalue(), error
+
+
+def parse_stage_list(value):
+    stages = [stage.strip() for stage in value.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"Unknown stage(s): {', '.join(unknown)}. "
+            f"Available stages: {', '.join(STAGES)}"
+        )
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--start",
+        "-s",
+        type=ymd,
+        help="Start date (YYYY-MM-DD, defaults to 1 week ago)",
+    )
+    parser.add_argument(
+        "--only", type=parse_stage_list, help="Comma-separated stages to run"
+    )
+    parser.add_argument(
+        "--skip", type=parse_stage_list, help="Comma-separated stages to skip"
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=len(COLLECTORS),
+        help=f"Stages to run concurrently (defaults to {len(COLLECTORS)})",
+    )
+    args = parser.parse_args()
+
+    selected = [
+        stage
+        for stage in STAGES
+        if (not args.only or stage in args.only)
+        and (not args.skip or stage not in args.skip)
+    ]
+    # Dependencies on stages that are not selected are ignored.
+    dependencies = {
+        stage: {dep for dep in STAGES[stage].get("after", []) if dep in selected}
+        for stage in selected
+    }
+    waits = {
+        stage: {dep for dep in STAGES[stage].get("wait", []) if dep in selected}
+        for stage in selected
+    }
+
+    completed = set()
+    failed = set()
+    timings = {}
+    pending = list(selected)
+    running = {}
+    start_time = time.monotonic()
+
+    # Fork, so that workers inherit modules already imported.
+    with ProcessPoolExecutor(
+        max_workers=max(1, args.jobs),
+        mp_context=multiprocessing.get_context("fork"),
+    ) as executor:
+        while pending or running:
+            for stage in list(pending):
+                if dependencies[stage] & failed:
+                    print(f"\n--------------\n\nSkipping {stage}: dependency failed")
+                    pending.remove(stage)
+                    failed.add(stage)
+                elif (
+                    dependencies[stage] <= completed
+                    and waits[stage] <= completed | failed
+                ):
+                    argv = list(STAGES[stage].get("args", []))
+                    if args.start and STAGES[stage].get("dates"):
+                        argv += ["--start", args.start.strftime("%Y-%m-%d")]
+                    future = executor.submit(run_stage, stage, argv)
+                    running[future] = (stage, time.monotonic())
+                    pending.remove(stage)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, stage_start = running.pop(future)
+                timings[stage] = time.monotonic() - stage_start
+                try:
+                    output, error = future.result()
+                except Exception:
+                    output, error = "", traceback.format_exc()
+
+                print(f"\n--------------\n\n{STAGES[stage]['title']} ({stage})")
+                print(output, end="")
+                if error:
+                    print(f"\n*** {stage} failed: {error}")
+                    failed.add(stage)
+                else:
+                    completed.add(stage)
+
+    print("\n--------------\n\nTimings:")
+    for stage in selected:
+        if stage in timings:
+            status = "failed" if stage in failed else "ok"
+            print(f"- {stage}: {timings[stage]:.1f}s ({status})")
+        else:
+            print(f"- {stage}: skipped")
+    print(f"Total: {time.monotonic() - start_time:.1f}s")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()